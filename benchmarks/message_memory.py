@@ -0,0 +1,102 @@
+"""
+Measures memory used per buffered SqsMessage and SnsNotification,
+compared to objects with the same instance attributes kept in a __dict__
+(which is how both classes stored them before they got __slots__).
+
+    python -m benchmarks.message_memory
+"""
+
+import gc
+import json
+import tracemalloc
+
+from bwrapper.json_utils import from_json
+from bwrapper.sns import SnsNotification
+from bwrapper.sqs import _NOT_LOADED, SqsMessage
+
+NUM_MESSAGES = 10000
+
+
+def raw_sqs_message(i: int):
+    return {
+        "MessageId": f"message-{i}",
+        "ReceiptHandle": f"receipt-handle-{i}",
+        "MD5OfBody": "937291ea09c5c6979c06e41eaa070fb1",
+        "Body": json.dumps({"job": "resize", "id": i}),
+        "MessageAttributes": {
+            "type": {"StringValue": "resize", "DataType": "String"},
+        },
+    }
+
+
+class DictSqsMessage:
+    """
+    Baseline: the instance attributes of SqsMessage in a __dict__.
+    """
+
+    def __init__(self, raw, *, decoded: bool = False):
+        for name in SqsMessage.__slots__:
+            setattr(self, name, None)
+        self.raw = raw
+        self.receipt_handle = raw["ReceiptHandle"]
+        if decoded:
+            self._body = from_json(raw["Body"])
+            self._attributes = {k: v["StringValue"] for k, v in raw["MessageAttributes"].items()}
+        else:
+            self._body = _NOT_LOADED
+            self._attributes = _NOT_LOADED
+
+
+class DictSnsNotification:
+    """
+    Baseline: the instance attributes of SnsNotification in a __dict__.
+    """
+
+    def __init__(self, *, message, topic_arn: str = None, subject: str = None):
+        for name in SnsNotification.__slots__:
+            setattr(self, name, None)
+        self._message = message
+        self.topic_arn = topic_arn
+        self.subject = subject
+
+
+def measure(factory) -> float:
+    """
+    Returns the number of bytes allocated per object created by factory(i),
+    not counting the inputs passed to the factory.
+    """
+    inputs = [raw_sqs_message(i) for i in range(NUM_MESSAGES)]
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = [factory(inputs[i]) for i in range(NUM_MESSAGES)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(objects) == NUM_MESSAGES
+    return (after - before) / NUM_MESSAGES
+
+
+def main():
+    print(f"{'':36} {'__dict__':>10} {'__slots__':>10}")
+
+    received = measure(lambda raw: SqsMessage.from_sqs_dict(raw))
+    baseline = measure(lambda raw: DictSqsMessage(raw))
+    print(f"{'SqsMessage (received, not decoded)':36} {baseline:10.1f} {received:10.1f}  bytes/message")
+
+    decoded = measure(lambda raw: _decoded(SqsMessage.from_sqs_dict(raw)))
+    baseline = measure(lambda raw: DictSqsMessage(raw, decoded=True))
+    print(f"{'SqsMessage (received, decoded)':36} {baseline:10.1f} {decoded:10.1f}  bytes/message")
+
+    notifications = measure(lambda raw: SnsNotification(message=raw["Body"], topic_arn="arn:topic", subject="Ha"))
+    baseline = measure(lambda raw: DictSnsNotification(message=raw["Body"], topic_arn="arn:topic", subject="Ha"))
+    print(f"{'SnsNotification':36} {baseline:10.1f} {notifications:10.1f}  bytes/notification")
+
+
+def _decoded(message: SqsMessage) -> SqsMessage:
+    message.body
+    message.attributes
+    return message
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from bwrapper.log import LogMixin
+from bwrapper.sqs import MAX_BATCH_SIZE, SqsMessage, SqsQueue
+
+
+class SqsAckBuffer(LogMixin):
+    """
+    Collects message deletions and visibility timeout changes for a single queue
+    and sends them as DeleteMessageBatch and ChangeMessageVisibilityBatch calls.
+
+    Pending acknowledgements are flushed when `max_size` of them have been collected
+    or when the oldest of them has waited for `max_latency` seconds, whichever comes first.
+    Call close() on shutdown to flush whatever is left.
+
+    To make SqsMessage.delete(), hold() and release() go through the buffer, attach it to the queue:
+
+        queue.ack_buffer = SqsAckBuffer(queue)
+    """
+
+    def __init__(self, queue: SqsQueue, *, max_size: int = MAX_BATCH_SIZE, max_latency: float = 1.0):
+        self.queue = queue
+        self.max_size = max_size
+        self.max_latency = max_latency
+
+        # Keyed by receipt handle so that a later acknowledgement of the same message replaces an earlier one.
+        self._deletes: Dict[str, SqsMessage] = {}
+        self._visibility_changes: Dict[str, Tuple[SqsMessage, int]] = {}
+        self._oldest: float = None
+
+        self._cond = threading.Condition()
+        self._thread: threading.Thread = None
+        self._is_closed = False
+
+    def __len__(self):
+        return len(self._deletes) + len(self._visibility_changes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def delete(self, message: SqsMessage):
+        with self._cond:
+            self._visibility_changes.pop(message.receipt_handle, None)
+            self._deletes[message.receipt_handle] = message
+            self._added()
+
+    def change_visibility_timeout(self, message: SqsMessage, *, timeout: int):
+        with self._cond:
+            if message.receipt_handle in self._deletes:
+                self.log.debug(f"Ignoring visibility change of {message} which is pending deletion")
+                return
+            self._visibility_changes[message.receipt_handle] = (message, timeout)
+            self._added()
+
+    def _added(self):
+        if self._is_closed:
+            raise RuntimeError(f"{self} is closed")
+        if self._oldest is None:
+            self._oldest = time.time()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.__class__.__name__}-flusher", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._is_closed and not self._is_due():
+                    if self._oldest is None:
+                        self._cond.wait()
+                    else:
+                        self._cond.wait(max(0.0, self._oldest + self.max_latency - time.time()))
+                if self._is_closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                # Failed acknowledgements are back in the buffer, retry them after max_latency
+                self.log.warning(f"Flushing acknowledgements to {self.queue} failed: {e}")
+                with self._cond:
+                    self._cond.wait_for(lambda: self._is_closed, timeout=self.max_latency)
+
+    def _is_due(self) -> bool:
+        if self._oldest is None:
+            return False
+        return len(self) >= self.max_size or time.time() - self._oldest >= self.max_latency
+
+    def flush(self):
+        """
+        Send all pending acknowledgements now.
+        If sending raises, the acknowledgements that weren't sent are put back in the buffer
+        (unless they have been superseded in the meantime) and the exception is re-raised.
+        """
+        with self._cond:
+            deletes = list(self._deletes.values())
+            visibility_changes = list(self._visibility_changes.values())
+            self._deletes.clear()
+            self._visibility_changes.clear()
+            self._oldest = None
+
+        try:
+            if visibility_changes:
+                self.log.debug(f"Flushing {len(visibility_changes)} visibility changes to {self.queue}")
+                self.queue.change_visibility_timeouts(visibility_changes)
+                visibility_changes = []
+            if deletes:
+                self.log.debug(f"Flushing {len(deletes)} deletions to {self.queue}")
+                self.queue.delete_messages(deletes)
+                deletes = []
+        except Exception:
+            self._put_back(deletes, visibility_changes)
+            raise
+
+    def _put_back(self, deletes: List[SqsMessage], visibility_changes: List[Tuple[SqsMessage, int]]):
+        with self._cond:
+            for message in deletes:
+                self._visibility_changes.pop(message.receipt_handle, None)
+                self._deletes.setdefault(message.receipt_handle, message)
+            for message, timeout in visibility_changes:
+                if message.receipt_handle not in self._deletes:
+                    self._visibility_changes.setdefault(message.receipt_handle, (message, timeout))
+            if len(self) and self._oldest is None:
+                self._oldest = time.time()
+
+    def close(self):
+        """
+        Stop the background flusher and flush all pending acknowledgements.
+        """
+        with self._cond:
+            self._is_closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
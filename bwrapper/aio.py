@@ -0,0 +1,143 @@
+"""
+Asyncio counterparts of SqsQueue and Notsy.
+
+boto3 has no asyncio support, so calls are run in a thread pool shared by all instances
+with the same `max_concurrency`, leaving the event loop free while requests are in flight.
+Serialisation is done by SqsMessage and SnsNotification, exactly as in the synchronous API.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import threading
+from typing import AsyncIterator, Dict, Iterable, List, Tuple, Union
+
+from bwrapper.log import LogMixin
+from bwrapper.notsy import Notsy
+from bwrapper.sns import SnsNotification
+from bwrapper.sqs import SqsMessage, SqsQueue, SqsSendResult
+
+DEFAULT_MAX_CONCURRENCY = 10
+
+_executors: Dict[int, concurrent.futures.ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(max_workers: int) -> concurrent.futures.ThreadPoolExecutor:
+    with _executors_lock:
+        if max_workers not in _executors:
+            _executors[max_workers] = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="bwrapper-aio",
+            )
+        return _executors[max_workers]
+
+
+class _AsyncCaller:
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._executor = _get_executor(max_concurrency)
+
+        # Created on first use so that it belongs to the running event loop
+        self._semaphore: asyncio.Semaphore = None
+
+    async def _call(self, func, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                functools.partial(func, *args, **kwargs),
+            )
+
+
+class AsyncSqsQueue(LogMixin, _AsyncCaller):
+    """
+    Asyncio wrapper around SqsQueue.
+    At most `max_concurrency` requests of this queue are in flight at any time.
+
+        queue = AsyncSqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+        await queue.send_message(SqsMessage(body={"hello": "world"}))
+
+        async for message in queue:
+            ...
+            await queue.delete_message(message)
+    """
+
+    def __init__(self, queue: Union[str, SqsQueue], *, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        super().__init__(max_concurrency=max_concurrency)
+        self.queue = SqsQueue(url=queue) if isinstance(queue, str) else queue
+
+    @property
+    def url(self) -> str:
+        return self.queue.url
+
+    async def send_message(self, message: SqsMessage):
+        await self._call(self.queue.send_message, message)
+
+    async def send_messages(self, messages: Iterable[SqsMessage]) -> List[SqsSendResult]:
+        return await self._call(self.queue.send_messages, list(messages))
+
+    async def receive_messages(
+        self,
+        max_num_messages: int = 10,
+        wait_time_seconds: int = None,
+    ) -> List[SqsMessage]:
+        return await self._call(
+            lambda: list(self.queue.receive_messages(
+                max_num_messages=max_num_messages,
+                wait_time_seconds=wait_time_seconds,
+            ))
+        )
+
+    async def receive_message(self) -> SqsMessage:
+        """
+        Returns None if no messages were seen.
+        """
+        for message in await self.receive_messages(max_num_messages=1):
+            return message
+
+    async def delete_message(self, message: SqsMessage):
+        await self._call(self.queue.delete_message, message)
+
+    async def delete_messages(self, messages: Iterable[SqsMessage]) -> List[SqsMessage]:
+        return await self._call(self.queue.delete_messages, list(messages))
+
+    async def change_visibility_timeout(self, *, message: SqsMessage, timeout: int):
+        await self._call(self.queue.change_visibility_timeout, message=message, timeout=timeout)
+
+    async def change_visibility_timeouts(self, timeouts: Iterable[Tuple[SqsMessage, int]]) -> List[SqsMessage]:
+        return await self._call(self.queue.change_visibility_timeouts, list(timeouts))
+
+    async def hold_message(self, message: SqsMessage, *, timeout: int):
+        await self.change_visibility_timeout(message=message, timeout=timeout)
+
+    async def release_message(self, message: SqsMessage):
+        await self.change_visibility_timeout(message=message, timeout=0)
+
+    async def iter_messages(self, max_num_messages: int = 10) -> AsyncIterator[SqsMessage]:
+        """
+        Keep long-polling the queue and yield messages as they arrive.
+        """
+        while True:
+            for message in await self.receive_messages(max_num_messages=max_num_messages):
+                yield message
+
+    def __aiter__(self) -> AsyncIterator[SqsMessage]:
+        return self.iter_messages()
+
+    def __str__(self):
+        return str(self.queue)
+
+
+class AsyncNotsy(LogMixin, _AsyncCaller):
+    """
+    Asyncio wrapper around Notsy.
+    """
+
+    def __init__(self, *, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        super().__init__(max_concurrency=max_concurrency)
+        self.notsy = Notsy()
+
+    async def publish(self, notification: SnsNotification):
+        return await self._call(self.notsy.publish, notification)
@@ -0,0 +1,87 @@
+"""
+Blob stores used to offload message bodies which are too large for SQS ("claim check").
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import uuid
+from typing import BinaryIO, ContextManager, Iterator
+
+# Size of chunks in which blobs are written and read
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobStore:
+    """
+    Interface of blob stores.
+
+    Implementations must be picklable (they travel with messages to job processes)
+    and must stream contents instead of buffering them in memory.
+    An S3 implementation would, for example, return the StreamingBody of get_object()
+    from open_reader() and upload parts as they are written in open_writer().
+    """
+
+    def new_key(self) -> str:
+        return uuid.uuid4().hex
+
+    def open_writer(self, key: str) -> ContextManager[BinaryIO]:
+        """
+        Returns a context manager that yields a binary file-like object to write the blob to.
+        The blob must only become readable once the context manager exits without an exception.
+        """
+        raise NotImplementedError()
+
+    def open_reader(self, key: str) -> BinaryIO:
+        """
+        Returns a binary file-like object from which the blob can be read.
+        """
+        raise NotImplementedError()
+
+    def delete(self, key: str):
+        raise NotImplementedError()
+
+    def write_text(self, key: str, text: str):
+        with self.open_writer(key) as writer:
+            for i in range(0, len(text), CHUNK_SIZE):
+                writer.write(text[i:i + CHUNK_SIZE].encode("utf-8"))
+
+    def read_text(self, key: str) -> str:
+        with self.open_reader(key) as reader:
+            return io.TextIOWrapper(reader, encoding="utf-8").read()
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Stores blobs as files in a local directory.
+    Useful for tests and for setups where producers and consumers share a filesystem.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        if os.path.basename(key) != key:
+            raise ValueError(f"Invalid blob key {key!r}")
+        return os.path.join(self.root, key)
+
+    @contextlib.contextmanager
+    def open_writer(self, key: str) -> Iterator[BinaryIO]:
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield f
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def open_reader(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb", buffering=CHUNK_SIZE)
+
+    def delete(self, key: str):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._path(key))
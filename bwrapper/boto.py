@@ -1,6 +1,173 @@
-import boto3
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Tuple
 
-# from botocore.config import Config
+# boto3 and botocore are imported when the first client is created, so that
+# importing bwrapper (e.g. in CLIs and job processes) doesn't pay for importing them.
+if TYPE_CHECKING:
+    from botocore.config import Config
+    from botocore.credentials import RefreshableCredentials
+
+
+class ClientRegistry:
+    """
+    Creates and caches boto3 clients and resources.
+
+    Clients are cached per process and, unless `per_thread` is False, per thread,
+    so that threads don't share a connection pool and processes forked from
+    this one never use clients (and open connections) inherited from the parent.
+    Creation is lock-protected because boto3 sessions are not thread-safe.
+
+    Clients for a `role_arn` use credentials obtained with sts:AssumeRole. These are cached
+    per process and refreshed by botocore shortly before they expire.
+    """
+
+    # Name of the session passed to sts:AssumeRole
+    role_session_name = "bwrapper"
+
+    def __init__(self, *, per_thread: bool = True, max_pool_connections: int = None, tcp_keepalive: bool = None):
+        self.per_thread = per_thread
+        self.max_pool_connections = max_pool_connections
+        self.tcp_keepalive = tcp_keepalive
+
+        # Roles to assume when accessing resources of an account, by account id
+        self.account_roles: Dict[str, str] = {}
+
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._instances: Dict[Tuple, Any] = {}
+        self._credentials: Dict[str, "RefreshableCredentials"] = {}
+
+    def configure(self, *, per_thread: bool = None, max_pool_connections: int = None, tcp_keepalive: bool = None):
+        """
+        Change settings of clients created from now on and discard all cached clients.
+        """
+        if per_thread is not None:
+            self.per_thread = per_thread
+        if max_pool_connections is not None:
+            self.max_pool_connections = max_pool_connections
+        if tcp_keepalive is not None:
+            self.tcp_keepalive = tcp_keepalive
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+            self._credentials.clear()
+
+    def register_account_role(self, account_id: str, role_arn: str):
+        """
+        Assume `role_arn` whenever resources of `account_id` are accessed, see SqsQueue.sqs.
+        """
+        self.account_roles[account_id] = role_arn
+
+    def get(
+        self,
+        type: str,
+        service_name: str,
+        *,
+        region_name: str = None,
+        config: "Config" = None,
+        role_arn: str = None,
+    ):
+        if self._pid != os.getpid():
+            # Forked without os.register_at_fork support
+            self._reset()
+
+        key = (
+            threading.get_ident() if self.per_thread else None,
+            type,
+            service_name,
+            region_name,
+            id(config) if config else None,
+            role_arn,
+        )
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = self._create(
+                        type,
+                        service_name,
+                        region_name=region_name,
+                        config=config,
+                        role_arn=role_arn,
+                    )
+                    self._instances[key] = instance
+        return instance
+
+    def _create(
+        self,
+        type: str,
+        service_name: str,
+        *,
+        region_name: str = None,
+        config: "Config" = None,
+        role_arn: str = None,
+    ):
+        import boto3
+
+        extras = {}
+        if region_name:
+            extras["region_name"] = region_name
+        config = self._merge_config(config)
+        if config:
+            extras["config"] = config
+        session = boto3.session.Session()
+        if role_arn:
+            from botocore.session import get_session
+            botocore_session = get_session()
+            # botocore has no public API to give a session refreshable credentials.
+            botocore_session._credentials = self._get_role_credentials(role_arn)
+            session = boto3.session.Session(botocore_session=botocore_session)
+        return getattr(session, type)(service_name, **extras)
+
+    def _get_role_credentials(self, role_arn: str) -> "RefreshableCredentials":
+        """
+        Must be called while holding the lock.
+        """
+        from botocore.credentials import RefreshableCredentials
+
+        if role_arn not in self._credentials:
+            self._credentials[role_arn] = RefreshableCredentials.create_from_metadata(
+                metadata=self._assume_role(role_arn),
+                refresh_using=lambda: self._assume_role(role_arn),
+                method="sts-assume-role",
+            )
+        return self._credentials[role_arn]
+
+    def _assume_role(self, role_arn: str) -> Dict:
+        import boto3
+
+        # Not using the cache because this is called while holding the lock.
+        sts = boto3.session.Session().client("sts")
+        credentials = sts.assume_role(RoleArn=role_arn, RoleSessionName=self.role_session_name)["Credentials"]
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
+
+    def _merge_config(self, config: "Config" = None) -> "Config":
+        from botocore.config import Config
+
+        defaults = {}
+        if self.max_pool_connections is not None:
+            defaults["max_pool_connections"] = self.max_pool_connections
+        if self.tcp_keepalive is not None:
+            defaults["tcp_keepalive"] = self.tcp_keepalive
+        if not defaults:
+            return config
+        if config is None:
+            return Config(**defaults)
+        return Config(**defaults).merge(config)
 
 
 class Boto:
@@ -8,6 +175,8 @@ class Boto:
     Namespace for all boto3 clients.
     """
 
+    registry = ClientRegistry()
+
     class ClientOrResource:
         def __init__(
             self,
@@ -18,7 +187,6 @@ class Boto:
             type="client",
         ):
             self.service_name = service_name
-            self.instance = None
             self.region_name = region_name
             self.requires_region = requires_region
             self.config = config
@@ -29,16 +197,12 @@ class Boto:
                 self.service_name = name
 
         def __get__(self, instance, owner):
-            if self.instance is None:
-                extras = {}
-                if self.region_name:
-                    extras["region_name"] = self.region_name
-                elif self.requires_region:
-                    extras["region_name"] = boto3.session.Session().region_name or "eu-west-1"
-                if self.config:
-                    extras["config"] = self.config
-                self.instance = getattr(boto3, self.type)(self.service_name, **extras)
-            return self.instance
+            region_name = self.region_name
+            if not region_name and self.requires_region:
+                import boto3
+                region_name = boto3.session.Session().region_name or "eu-west-1"
+                self.region_name = region_name
+            return Boto.registry.get(self.type, self.service_name, region_name=region_name, config=self.config)
 
     sqs = ClientOrResource(requires_region=True)
     sns = ClientOrResource(requires_region=True)
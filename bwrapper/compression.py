@@ -0,0 +1,115 @@
+"""
+Compression of SQS message bodies.
+
+Compressed bodies are base64-encoded and marked with the ENCODING_ATTRIBUTE message attribute
+whose value names the compressor, e.g. "zlib+base64". Messages without the attribute are left alone.
+"""
+
+import base64
+import zlib
+from typing import Dict, List, Tuple
+
+# Name of the message attribute which marks how the message body is encoded
+ENCODING_ATTRIBUTE = "bwrapper.encoding"
+
+
+class Compressor:
+    name: str = None
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+
+class ZlibCompressor(Compressor):
+    name = "zlib"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        import zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    name = "lz4"
+
+    def __init__(self):
+        import lz4.frame
+        self._lz4_frame = lz4.frame
+
+    def compress(self, data: bytes) -> bytes:
+        return self._lz4_frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._lz4_frame.decompress(data)
+
+
+# Registered compressors by name, in the order of preference for get_compressor("auto")
+_compressor_classes: Dict[str, type] = {}
+_compressors: Dict[str, Compressor] = {}
+
+
+def register_compressor(compressor_cls: type):
+    _compressor_classes[compressor_cls.name] = compressor_cls
+
+
+def list_compressors() -> List[str]:
+    return list(_compressor_classes)
+
+
+def get_compressor(name: str) -> Compressor:
+    """
+    Returns compressor by name.
+    Pass "auto" to get the first registered compressor whose dependencies are installed.
+    Raises ImportError if the compressor requires a package which is not installed.
+    """
+    if name == "auto":
+        for compressor_name in _compressor_classes:
+            try:
+                return get_compressor(compressor_name)
+            except ImportError:
+                continue
+    if name not in _compressors:
+        _compressors[name] = _compressor_classes[name]()
+    return _compressors[name]
+
+
+register_compressor(ZstdCompressor)
+register_compressor(Lz4Compressor)
+register_compressor(ZlibCompressor)
+
+
+def compress_body(body: str, compressor: Compressor) -> Tuple[str, str]:
+    """
+    Returns the compressed body and the value of the ENCODING_ATTRIBUTE.
+    """
+    compressed = compressor.compress(body.encode("utf-8"))
+    return base64.b64encode(compressed).decode("ascii"), f"{compressor.name}+base64"
+
+
+def decompress_body(body: str, encoding: str) -> str:
+    compressor_name, _, transfer_encoding = encoding.partition("+")
+    if transfer_encoding != "base64":
+        raise ValueError(f"Unsupported message body encoding {encoding!r}")
+    return get_compressor(compressor_name).decompress(base64.b64decode(body)).decode("utf-8")
@@ -0,0 +1,126 @@
+import collections
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict
+
+from bwrapper.json_utils import from_json, to_json
+from bwrapper.log import LogMixin
+from bwrapper.sqs import SqsMessage
+
+
+class IdempotencyCache(LogMixin):
+    """
+    Remembers the keys of recently completed messages so that duplicate deliveries can be skipped.
+
+    Keeps at most `max_size` keys, evicting the least recently used ones, each for at most `ttl` seconds.
+    The key of a message is its SQS message ID unless `key_func(message)` is passed,
+    which should be used when the same job may be sent more than once.
+
+    If `path` is set, the cache is loaded from this file when created and saved to it
+    at most every `save_interval` seconds and on close().
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: int = 10000,
+        ttl: float = 3600,
+        key_func: Callable[[SqsMessage], str] = None,
+        path: str = None,
+        save_interval: float = 10,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_func = key_func
+        self.path = path
+        self.save_interval = save_interval
+
+        # Expiry time by key, least recently used first
+        self._expires_at: Dict[str, float] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._saved_at = time.time()
+        self._is_dirty = False
+
+        if self.path:
+            self.load()
+
+    def get_key(self, message: SqsMessage) -> str:
+        if self.key_func is not None:
+            return self.key_func(message)
+        return message.message_id
+
+    def __contains__(self, message: SqsMessage) -> bool:
+        key = self.get_key(message)
+        if key is None:
+            return False
+        with self._lock:
+            expires_at = self._expires_at.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._expires_at[key]
+                return False
+            self._expires_at.move_to_end(key)
+            return True
+
+    def add(self, message: SqsMessage):
+        key = self.get_key(message)
+        if key is None:
+            return
+        with self._lock:
+            self._expires_at[key] = time.time() + self.ttl
+            self._expires_at.move_to_end(key)
+            while len(self._expires_at) > self.max_size:
+                self._expires_at.popitem(last=False)
+            self._is_dirty = True
+            should_save = self.path and time.time() - self._saved_at >= self.save_interval
+        if should_save:
+            self.save()
+
+    def __len__(self):
+        return len(self._expires_at)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                entries = from_json(f.read())
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            self.log.warning(f"Ignoring invalid idempotency cache file {self.path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, expires_at in entries[-self.max_size:]:
+                if expires_at > now:
+                    self._expires_at[key] = expires_at
+        self.log.debug(f"Loaded {len(self._expires_at)} keys from {self.path}")
+
+    def save(self):
+        """
+        Write the cache to `path`, replacing the file atomically.
+        """
+        now = time.time()
+        with self._lock:
+            entries = [[key, expires_at] for key, expires_at in self._expires_at.items() if expires_at > now]
+            self._saved_at = now
+            self._is_dirty = False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(to_json(entries))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+
+    def close(self):
+        if self.path and self._is_dirty:
+            self.save()
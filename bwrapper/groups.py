@@ -0,0 +1,113 @@
+import collections
+import concurrent.futures
+import threading
+from typing import Callable, Deque, Dict, Hashable, List
+
+from bwrapper.log import LogMixin
+from bwrapper.sqs import SqsMessage
+
+
+def get_group_key(message: SqsMessage) -> Hashable:
+    """
+    Messages with the same key must be handled one after another.
+    Messages without a group (of standard queues) each have a group of their own.
+    """
+    if message.group_id is None:
+        return message.queue_url, None, message.receipt_handle
+    return message.queue_url, message.group_id
+
+
+class MessageGroupExecutor(LogMixin):
+    """
+    Handles messages of different message groups concurrently in up to `max_workers` threads,
+    and messages of the same group one after another, in the order they were submitted.
+
+    `handle(message)` returns True if the next message of the group may be handled.
+    If it returns False (or raises), the messages of the group that are still waiting
+    are passed to `discard(messages)` instead, so that they are received again in order.
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[SqsMessage], bool],
+        discard: Callable[[List[SqsMessage]], None],
+        *,
+        max_workers: int,
+        max_pending: int,
+    ):
+        self.handle = handle
+        self.discard = discard
+        self.max_workers = max_workers
+
+        # Maximum number of messages submitted but not yet handled, in all groups together
+        self.max_pending = max_pending
+
+        # Messages waiting for their turn by group key. A group is in here while one of its messages is handled.
+        self._groups: Dict[Hashable, Deque[SqsMessage]] = {}
+        self._num_pending = 0
+        self._cond = threading.Condition()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=self.__class__.__name__,
+        )
+
+    def wait_for_capacity(self) -> int:
+        """
+        Block until a worker thread is free and return how many more messages may be submitted:
+        no more than there are free worker threads, so that every submitted message either starts
+        right away or waits behind an earlier message of its group.
+        """
+        with self._cond:
+            while len(self._groups) >= self.max_workers or self._num_pending >= self.max_pending:
+                self._cond.wait()
+            return min(self.max_workers - len(self._groups), self.max_pending - self._num_pending)
+
+    def get_num_waiting(self, message: SqsMessage) -> int:
+        """
+        Number of messages that would be handled before `message` if it was submitted now,
+        not counting the one that is being handled.
+        """
+        with self._cond:
+            group = self._groups.get(get_group_key(message))
+            return 0 if group is None else len(group) + 1
+
+    def submit(self, message: SqsMessage):
+        key = get_group_key(message)
+        with self._cond:
+            self._num_pending += 1
+            if key in self._groups:
+                self._groups[key].append(message)
+                return
+            self._groups[key] = collections.deque()
+        self._executor.submit(self._run_group, key, message)
+
+    def _run_group(self, key: Hashable, message: SqsMessage):
+        while message is not None:
+            try:
+                may_continue = self.handle(message)
+            except Exception as e:
+                self.log.error(f"Handling {message} failed:")
+                self.log.exception(e)
+                may_continue = False
+
+            handled, discarded = message, []
+            with self._cond:
+                self._num_pending -= 1
+                group = self._groups[key]
+                if not may_continue and group:
+                    discarded = list(group)
+                    group.clear()
+                    self._num_pending -= len(discarded)
+                if group:
+                    message = group.popleft()
+                else:
+                    message = None
+                    del self._groups[key]
+                self._cond.notify_all()
+
+            if discarded:
+                self.log.warning(f"Discarding {len(discarded)} messages waiting after failed {handled}")
+                self.discard(discarded)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,92 @@
+import collections
+import threading
+import time
+from typing import Dict, List
+
+from bwrapper.log import LogMixin
+from bwrapper.sqs import SqsMessage, SqsQueue
+
+
+class VisibilityHeartbeat(LogMixin):
+    """
+    Keeps messages invisible while they are being worked on by extending their visibility timeout
+    to `window` seconds every `interval` seconds, from a single background thread.
+    Extensions of all registered messages that are due at the same time are sent
+    as ChangeMessageVisibilityBatch calls, one per queue.
+
+    If the worker dies, messages become visible again within `window` seconds.
+    """
+
+    def __init__(self, *, window: int = 30, interval: float = None):
+        self.window = window
+        self.interval = interval or window / 3.0
+
+        # Next extension time by message
+        self._messages: Dict[SqsMessage, float] = {}
+        self._cond = threading.Condition()
+
+        # Held while extensions are being sent so that unregister() never races with them
+        self._sending_lock = threading.Lock()
+
+        self._thread: threading.Thread = None
+        self._is_stopped = False
+
+    def register(self, message: SqsMessage):
+        """
+        Start extending the visibility timeout of the message.
+        The caller is expected to have set it to `window` seconds already.
+        """
+        with self._cond:
+            self._messages[message] = time.time() + self.interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def unregister(self, message: SqsMessage):
+        """
+        Stop extending the visibility timeout of the message.
+        Once this returns, no more extensions of the message will be sent.
+        """
+        with self._sending_lock:
+            with self._cond:
+                self._messages.pop(message, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._is_stopped:
+                    next_due = min(self._messages.values(), default=None)
+                    if next_due is not None and next_due <= time.time():
+                        break
+                    self._cond.wait(None if next_due is None else next_due - time.time())
+                if self._is_stopped:
+                    return
+            self._extend_due()
+
+    def _extend_due(self):
+        with self._sending_lock:
+            now = time.time()
+            # Extensions which are almost due are sent early, in the same batch
+            coalesce_until = now + self.interval / 4
+            by_queue: Dict[SqsQueue, List[SqsMessage]] = collections.defaultdict(list)
+            with self._cond:
+                for message, due in self._messages.items():
+                    if due <= coalesce_until:
+                        by_queue[message.queue].append(message)
+                        self._messages[message] = now + self.interval
+
+            for queue, messages in by_queue.items():
+                self.log.debug(f"Extending visibility of {len(messages)} messages in {queue} by {self.window}s")
+                try:
+                    queue.change_visibility_timeouts((message, self.window) for message in messages)
+                except Exception as e:
+                    self.log.warning(f"Extending visibility of messages in {queue} failed: {e}")
+
+    def close(self):
+        with self._cond:
+            self._is_stopped = True
+            self._messages.clear()
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
@@ -3,19 +3,33 @@ Jobsy is a single-process worker or job scheduler (when called with --enqueue).
 """
 
 import argparse
+import collections
+import concurrent.futures
 import contextlib
 import dataclasses
 import importlib
-import itertools
 import logging
 import multiprocessing
 import os
+import signal
+import threading
 import time
-from typing import Callable, Dict, Iterator, List, Tuple, Union
+import typing
+from typing import Any, Callable, Dict, List, Tuple, Union
 
+from bwrapper.ack import SqsAckBuffer
+from bwrapper.dedup import IdempotencyCache
+from bwrapper.groups import MessageGroupExecutor, get_group_key
+from bwrapper.heartbeat import VisibilityHeartbeat
 from bwrapper.log import LogMixin
+from bwrapper.polling import ConcurrentPoller
+from bwrapper.pool import WorkerPool
+from bwrapper.prefetch import SqsPrefetcher
+from bwrapper.routing import Route, Router
 from bwrapper.run_loop import RunLoopMixin
-from bwrapper.sqs import SqsMessage, SqsQueue
+from bwrapper.scheduling import QueuePolicy, create_queue_policy, list_queue_policies, parse_queue_url_arg
+from bwrapper.sqs import MAX_BATCH_SIZE, SqsMessage, SqsQueue
+from bwrapper.supervisor import ProcessSupervisor, get_supervisor
 
 log = logging.getLogger(__name__)
 
@@ -33,7 +47,31 @@ class _BadMessage(JobsyException):
 
 
 DEFAULT_TIMEOUT = 10
-MAX_PROCESS_CHECK_INTERVAL = 30
+
+# How long to wait for a prefetched message before completing an iteration without one
+PREFETCH_WAIT_TIME = 20
+
+
+def _run_and_send_result(conn, func: Callable, args: Tuple, kwargs: Dict):
+    """
+    Target of job processes whose result is needed by the parent process.
+    """
+    conn.send(func(*args, **kwargs))
+    conn.close()
+
+
+def _receive_result(conn, received: List):
+    """
+    Read the result of a job process while the process is running,
+    so that a result larger than the pipe buffer doesn't block it.
+    """
+    try:
+        received.append(conn.recv())
+    except EOFError:
+        # The process exited (or was terminated) without sending a result
+        pass
+    except Exception as e:
+        log.warning(f"Receiving job result failed: {e}")
 
 
 @dataclasses.dataclass
@@ -44,50 +82,95 @@ class Job:
     timeout: int
     message: SqsMessage
 
+    # Whatever the function returned, set by Jobsy.handle_job()
+    result: Any = None
+
+    # Whether the result has to be sent back when the function runs in a separate process.
+    # Results are sent over a pipe, so they must be picklable.
+    sends_result = False
+
+    @property
+    def subject(self) -> str:
+        return str(self.message)
+
     def run_in_separate_process(self, log: logging.Logger):
         """
         Runs the function in a separate process, but this call is still blocking.
         This keeps waiting for the job to complete or to time out.
         """
-
-        process = multiprocessing.Process(target=self.func, args=self.args, kwargs=self.kwargs)
+        reader, writer = None, None
+        if self.sends_result:
+            reader, writer = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_run_and_send_result,
+                args=(writer, self.func, self.args, self.kwargs),
+            )
+        else:
+            process = multiprocessing.Process(target=self.func, args=self.args, kwargs=self.kwargs)
         process.start()
+        received = []
+        receiver = None
+        if writer is not None:
+            writer.close()
+            receiver = threading.Thread(target=_receive_result, args=(reader, received), daemon=True)
+            receiver.start()
 
-        started = time.time()
-        while time.time() - started < self.timeout and process.is_alive():
-            # Wait for 10% of the expected timeout, but no longer than 30 seconds
-            time.sleep(min(self.timeout / 10.0, MAX_PROCESS_CHECK_INTERVAL))
-
-        if process.is_alive():
-            log.warning(f"Processing {self.message} has timed out, terminating it")
+        if get_supervisor().wait(process, timeout=self.timeout):
+            log.warning(f"Processing {self.subject} has timed out, terminated it")
+        process.join(ProcessSupervisor.kill_grace_period)
 
-            started_terminating = time.time()
-            process.terminate()
-            while time.time() - started_terminating < 3.0 and process.is_alive():
-                time.sleep(.1)
-
-            if process.is_alive():
-                log.error(f"Terminating {self.message} has timed out, killing it now")
-                started_killing = time.time()
-                process.kill()
-                while time.time() - started_killing < 1.0 and process.is_alive():
-                    time.sleep(.1)
+        result = None
+        if receiver is not None:
+            receiver.join(ProcessSupervisor.kill_grace_period)
+            if process.exitcode == 0 and received:
+                result = received[0]
+            reader.close()
 
         if process.exitcode == 0:
-            log.debug(f"Completed processing {self.message}")
+            log.debug(f"Completed processing {self.subject}")
         else:
-            log.error(f"Processing {self.message} exited with code {process.exitcode}")
+            log.error(f"Processing {self.subject} exited with code {process.exitcode}")
+            raise _JobFailed()
+        return result
+
+    def run_in_pool(self, pool: WorkerPool, log: logging.Logger):
+        """
+        Runs the function in one of the worker processes of the pool, blocking until it completes or times out.
+        """
+        try:
+            result = pool.run(self.func, self.args, self.kwargs, timeout=self.timeout)
+        except WorkerPool.JobFailed as e:
+            log.error(f"Processing {self.subject} failed: {e}")
             raise _JobFailed()
+        log.debug(f"Completed processing {self.subject}")
+        return result
 
     def run_in_same_process(self, log: logging.Logger):
         try:
-            self.func(*self.args, **self.kwargs)
+            return self.func(*self.args, **self.kwargs)
         except Exception as e:
-            log.error(f"Processing {self.message} failed:")
+            log.error(f"Processing {self.subject} failed:")
             log.exception(e)
             raise _JobFailed()
 
 
+@dataclasses.dataclass
+class BatchJob(Job):
+    """
+    A job handling several messages in one function call.
+    The function returns None if all messages were handled successfully,
+    otherwise a list with a truthy value for each message that was.
+    """
+
+    messages: List[SqsMessage] = None
+
+    sends_result = True
+
+    @property
+    def subject(self) -> str:
+        return f"batch of {len(self.messages)} messages"
+
+
 def resolve_func_call(*, func_path):
     module_path, func_name = func_path.rsplit(".", 1)
     module = importlib.import_module(module_path)
@@ -98,11 +181,12 @@ def resolve_func_call(*, func_path):
 
 class Jobsy(LogMixin, RunLoopMixin):
     """
-    A primitive, single-worker job runner where jobs are coming from one or more SQS queues
+    A primitive job runner where jobs are coming from one or more SQS queues.
+    Handles one job at a time unless `concurrency` is set.
     """
 
-    # What is the longest we will wait before checking again that the process executing the function is still alive.
-    _max_process_check_interval = 30
+    # What is the longest it may take to stop the process executing the function after it has timed out.
+    _max_termination_time = ProcessSupervisor.terminate_grace_period + ProcessSupervisor.kill_grace_period
 
     def __init__(
         self,
@@ -113,6 +197,30 @@ class Jobsy(LogMixin, RunLoopMixin):
         job_runner_path: str = None,
         default_timeout: int = None,
         delete_on_failure: bool = False,
+        buffer_acks: bool = False,
+        prefetch: int = 0,
+        poll_concurrently: bool = False,
+        max_poll_connections: int = None,
+        pool_size: int = 0,
+        worker_initializer_path: str = None,
+        max_tasks_per_child: int = None,
+        concurrency: int = 1,
+        heartbeat_window: int = None,
+        adaptive_sleep: bool = False,
+        queue_policy: Union[str, QueuePolicy] = "round-robin",
+        queue_weights: Dict[str, int] = None,
+        router: Router = None,
+        batch_size: int = None,
+        batch_wait: float = 1.0,
+        fifo_groups: bool = False,
+        dedup: IdempotencyCache = None,
+        max_attempts: int = None,
+        quarantine_queue: Union[str, SqsQueue] = None,
+        retry_delay_base: int = None,
+        retry_delay_max: int = 900,
+        max_message_age: Union[float, Dict[str, float]] = None,
+        expired_action: str = "delete",
+        expired_queue: Union[str, SqsQueue] = None,
     ):
         super().__init__()
 
@@ -129,43 +237,422 @@ class Jobsy(LogMixin, RunLoopMixin):
                     self.queues.append(q)
 
         self._same_process = same_process
-        self._queues_generator: Iterator[SqsQueue] = itertools.cycle(self.queues)
+
+        # Decides which queues are polled in which order, see bwrapper.scheduling.
+        # Weights are by queue URL. Not used when prefetching or polling concurrently.
+        self.queue_policy = create_queue_policy(queue_policy, self.queues, weights=queue_weights)
 
         self._job_runner = None
         if job_runner_path:
             self._job_runner = resolve_func_call(func_path=job_runner_path)
 
+        # If set, each message is handled by the handler of the route it matches, see bwrapper.routing.
+        self.router = router
+
+        # If set, the handler is called with lists of up to `batch_size` messages, collected for up to
+        # `batch_wait` seconds after the first ones have arrived. Batches are handled one at a time.
+        if batch_size and (router is not None or concurrency > 1):
+            raise ValueError("Batch mode supports neither routing nor concurrency")
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+
+        # If set, messages which have been handled successfully are remembered in this cache
+        # and their duplicate deliveries are deleted without being handled again.
+        self.dedup = dedup
+
         if max_iterations:
             self.run_loop.max_iterations = max_iterations
 
+        # If set to True, iterations which received messages are followed immediately by the next one,
+        # and idle ones by an exponentially growing sleep, instead of sleeping `run_loop_sleep` every time.
+        if adaptive_sleep:
+            self.run_loop.adaptive = True
+
         self.default_timeout = default_timeout or DEFAULT_TIMEOUT
 
         # If set to True, SQS messages will be deleted even when the job handling fails.
         self.delete_on_failure = delete_on_failure
 
-    def run_single_iteration(self):
+        # If set, messages which have failed `max_attempts` times (or have been received more often than that,
+        # for example because they crash the worker) are moved to `quarantine_queue`, or deleted if it is not set.
+        self.max_attempts = max_attempts
+        if isinstance(quarantine_queue, str):
+            quarantine_queue = SqsQueue(url=quarantine_queue)
+        self.quarantine_queue = quarantine_queue
+
+        # If set, failed messages become visible again after retry_delay_base * 2 ** (attempts - 1) seconds,
+        # at most `retry_delay_max`, instead of immediately.
+        self.retry_delay_base = retry_delay_base
+        self.retry_delay_max = retry_delay_max
+
+        # If set, messages sent longer than this many seconds ago (for all queues, or by queue URL)
+        # are not handled, unless their route sets its own max_age. Instead, depending on `expired_action`,
+        # they are left alone to become visible again ("skip"), deleted ("delete")
+        # or moved to `expired_queue` ("divert").
+        if max_message_age is None or isinstance(max_message_age, dict):
+            self.max_message_age = dict(max_message_age or {})
+        else:
+            self.max_message_age = {queue.url: max_message_age for queue in self.queues}
+        if expired_action not in ("skip", "delete", "divert"):
+            raise ValueError(f"Invalid expired_action {expired_action!r}")
+        if isinstance(expired_queue, str):
+            expired_queue = SqsQueue(url=expired_queue)
+        if expired_action == "divert" and expired_queue is None:
+            raise ValueError("expired_queue is required to divert expired messages")
+        self.expired_action = expired_action
+        self.expired_queue = expired_queue
+
+        # Counts of messages which weren't handled, by reason
+        self.metrics: typing.Counter[str] = collections.Counter()
+        self._metrics_lock = threading.Lock()
+
+        # If set to True, message deletions and visibility changes are sent in batches.
+        if buffer_acks:
+            for queue in self.queues:
+                if queue.ack_buffer is None:
+                    queue.ack_buffer = SqsAckBuffer(queue)
 
-        # Hold on to the first received message and release all the others we have picked
-        # as part of the same long poll before we start working on ours.
-        message: SqsMessage = None
+        # If set, messages are received in the background, up to `prefetch` of them buffered locally.
+        self._prefetcher: SqsPrefetcher = None
+        if prefetch:
+            self._prefetcher = SqsPrefetcher(self.queues, max_size=prefetch)
 
-        num_queues_checked = 0
-        while message is None and num_queues_checked < len(self.queues):
-            queue = next(self._queues_generator)
-            message = queue.receive_message()
-            num_queues_checked += 1
+        # If set to True, all queues are long-polled at the same time instead of one after another.
+        self._poller: ConcurrentPoller = None
+        if poll_concurrently:
+            self._poller = ConcurrentPoller(self.queues, max_connections=max_poll_connections)
+
+        # If set, jobs are run in `pool_size` long-lived worker processes instead of a new process per job.
+        # Job functions are pickled to be sent to the workers, so they must be module-level functions
+        # (`job_runner_path` or route handlers), not methods of this object.
+        self._pool: WorkerPool = None
+        if pool_size:
+            self._pool = WorkerPool(
+                pool_size,
+                initializer=resolve_func_call(func_path=worker_initializer_path) if worker_initializer_path else None,
+                max_tasks_per_child=max_tasks_per_child,
+            )
+            if router is None:
+                pool_funcs = [self._job_runner or (self.run_batch if batch_size else self.run_job)]
+            else:
+                # With a router, every job runs the handler of its route
+                pool_funcs = [
+                    route.handler for route in [*router.routes.values(), router.default]
+                    if route is not None and not route.same_process
+                ]
+            for func in pool_funcs:
+                WorkerPool.check_picklable(func)
+
+        # Maximum number of jobs handled at the same time, each in its own thread.
+        # No more messages are received than there are free slots.
+        self.concurrency = concurrency
+        self._executor: concurrent.futures.ThreadPoolExecutor = None
+        self._slots: threading.BoundedSemaphore = None
+
+        # If set to True, messages of different message groups (of FIFO queues) are handled concurrently,
+        # up to `concurrency` groups at a time, while messages of the same group are handled one after another.
+        # Messages waiting for their turn are held locally, see handle_grouped_messages().
+        self._group_executor: MessageGroupExecutor = None
+        if fifo_groups:
+            if batch_size:
+                raise ValueError("Batch mode does not support FIFO groups")
+            self._group_executor = MessageGroupExecutor(
+                self._handle_message_in_group,
+                self._release_discarded_messages,
+                max_workers=concurrency,
+                max_pending=concurrency + MAX_BATCH_SIZE,
+            )
+        elif concurrency > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=concurrency,
+                thread_name_prefix=self.__class__.__name__,
+            )
+            self._slots = threading.BoundedSemaphore(concurrency)
+
+        # If set, messages are held for `heartbeat_window` seconds at a time, extended in the background
+        # while their jobs are running, rather than for the whole job timeout up front.
+        self._heartbeat: VisibilityHeartbeat = None
+        if heartbeat_window:
+            self._heartbeat = VisibilityHeartbeat(window=heartbeat_window)
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Release prefetched messages, wait for running jobs to complete, stop worker processes
+        and flush any pending message acknowledgements.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+        if self._poller is not None:
+            self._poller.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._group_executor is not None:
+            self._group_executor.shutdown(wait=True)
+        if self._pool is not None:
+            self._pool.close()
+        if self._heartbeat is not None:
+            self._heartbeat.close()
+        for queue in self.queues:
+            if queue.ack_buffer is not None:
+                queue.ack_buffer.close()
+        if self.dedup is not None:
+            self.dedup.close()
+
+    def run_single_iteration(self) -> bool:
+        """
+        Returns True if a message was received.
+        """
+        if self.batch_size:
+            return self.run_batch_iteration()
+
+        if self._group_executor is not None:
+            return self.run_grouped_iteration()
+
+        if self._executor is not None:
+            return self.run_concurrent_iteration()
+
+        message = self.receive_message()
 
         if message is None:
             self.log.debug("Completed iteration, no messages received")
-            return
+            return False
 
         self.log.debug(f"Received {message}: {message.raw}")
         self.handle_message(message)
         self.log.debug("Completed iteration")
+        return True
 
-    def handle_message(self, message: SqsMessage):
-        with self.job_context(message=message) as job:
-            self.handle_job(job=job)
+    def run_concurrent_iteration(self) -> bool:
+        """
+        Wait for at least one free slot, receive at most as many messages as there are free slots,
+        and start handling them in the background. Returns True if any messages were received.
+        """
+        self._slots.acquire()
+        num_slots = 1
+        while num_slots < MAX_BATCH_SIZE and self._slots.acquire(blocking=False):
+            num_slots += 1
+
+        messages = []
+        try:
+            messages = self.receive_messages(max_num_messages=num_slots)
+        finally:
+            for _ in range(num_slots - len(messages)):
+                self._slots.release()
+
+        if not messages:
+            self.log.debug("Completed iteration, no messages received")
+            return False
+
+        for message in messages:
+            self.log.debug(f"Received {message}: {message.raw}")
+            self._executor.submit(self._handle_message_in_slot, message)
+        self.log.debug(f"Completed iteration, started handling {len(messages)} messages")
+        return True
+
+    def run_batch_iteration(self) -> bool:
+        """
+        Receive a batch of messages and handle them in a single job.
+        Returns True if any messages were received.
+        """
+        messages = self.receive_batch()
+
+        if not messages:
+            self.log.debug("Completed iteration, no messages received")
+            return False
+
+        self.log.debug(f"Received batch of {len(messages)} messages")
+        self.handle_batch(messages)
+        self.log.debug("Completed iteration")
+        return True
+
+    def run_grouped_iteration(self) -> bool:
+        """
+        Wait for a free worker thread, receive no more messages than there are free worker threads,
+        and submit them to be handled in the order of their message groups.
+        Returns True if any messages were received.
+        """
+        capacity = self._group_executor.wait_for_capacity()
+        messages = self.receive_messages(max_num_messages=min(MAX_BATCH_SIZE, capacity))
+
+        if not messages:
+            self.log.debug("Completed iteration, no messages received")
+            return False
+
+        self.handle_grouped_messages(messages)
+        self.log.debug(f"Completed iteration, submitted {len(messages)} messages")
+        return True
+
+    def handle_grouped_messages(self, messages: List[SqsMessage]):
+        """
+        Hold the messages which will have to wait for earlier messages of their groups
+        (long enough for all of them to be handled, or with the heartbeat if it is enabled),
+        then submit all of them to the group executor.
+        """
+        num_waiting_by_group: Dict = {}
+        holds: Dict[int, List[SqsMessage]] = collections.defaultdict(list)
+        for message in messages:
+            self.log.debug(f"Received {message} of group {message.group_id}: {message.raw}")
+            key = get_group_key(message)
+            if key not in num_waiting_by_group:
+                num_waiting_by_group[key] = self._group_executor.get_num_waiting(message)
+            num_waiting = num_waiting_by_group[key]
+            num_waiting_by_group[key] += 1
+            if num_waiting:
+                if self._heartbeat is not None:
+                    holds[self._heartbeat.window].append(message)
+                else:
+                    # One extra job time for the wait for a free worker thread
+                    job_time = self.default_timeout + self._max_termination_time + 5
+                    holds[(num_waiting + 2) * job_time].append(message)
+
+        for timeout, held_messages in holds.items():
+            self._change_visibility_timeouts(held_messages, timeout=timeout)
+            if self._heartbeat is not None:
+                for message in held_messages:
+                    self._heartbeat.register(message)
+
+        for message in messages:
+            self._group_executor.submit(message)
+
+    def _handle_message_in_group(self, message: SqsMessage) -> bool:
+        """
+        Returns True if the next message of the group may be handled.
+        """
+        try:
+            return self.handle_message(message) or self.delete_on_failure
+        finally:
+            # The message may have been registered while it was waiting for its turn,
+            # and handle_message() doesn't unregister messages it doesn't create a job for.
+            self._stop_heartbeat(message)
+
+    def _release_discarded_messages(self, messages: List[SqsMessage]):
+        for message in messages:
+            self._stop_heartbeat(message)
+        self._change_visibility_timeouts(messages, timeout=0)
+
+    def _handle_message_in_slot(self, message: SqsMessage):
+        try:
+            self.handle_message(message)
+        except Exception as e:
+            self.log.error(f"Handling {message} failed:")
+            self.log.exception(e)
+        finally:
+            self._slots.release()
+
+    def receive_message(self) -> SqsMessage:
+        """
+        Returns None if no messages were seen.
+        """
+        for message in self.receive_messages(max_num_messages=1):
+            return message
+
+    def receive_batch(self) -> List[SqsMessage]:
+        """
+        Receive up to `batch_size` messages, up to 10 per call, waiting for more of them
+        for no longer than `batch_wait` seconds after the first ones have arrived.
+        """
+        messages = self.receive_messages(max_num_messages=min(MAX_BATCH_SIZE, self.batch_size))
+        if not messages:
+            return messages
+
+        deadline = time.time() + self.batch_wait
+        while len(messages) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            wait_time_seconds = int(remaining)
+            more = self.receive_messages(
+                max_num_messages=min(MAX_BATCH_SIZE, self.batch_size - len(messages)),
+                max_wait_time_seconds=wait_time_seconds,
+            )
+            if not more and wait_time_seconds == 0:
+                break
+            messages.extend(more)
+        return messages
+
+    def receive_messages(self, max_num_messages: int, max_wait_time_seconds: int = None) -> List[SqsMessage]:
+        """
+        Receive up to `max_num_messages` messages from the first queue that has any,
+        waiting for no longer than `max_wait_time_seconds` per queue if it is set.
+        """
+        if self._prefetcher is not None:
+            timeout = PREFETCH_WAIT_TIME if max_wait_time_seconds is None else max_wait_time_seconds
+            message = self._prefetcher.get(timeout=timeout)
+            if message is None:
+                return []
+            messages = [message]
+            while len(messages) < max_num_messages:
+                message = self._prefetcher.get(timeout=0)
+                if message is None:
+                    break
+                messages.append(message)
+            return messages
+
+        if self._poller is not None:
+            message = self._poller.receive_message(timeout=max_wait_time_seconds)
+            return [message] if message is not None else []
+
+        for queue, wait_time_seconds in self.queue_policy.plan():
+            if max_wait_time_seconds is not None:
+                wait_time_seconds = min(wait_time_seconds, max_wait_time_seconds)
+            messages = list(queue.receive_messages(
+                max_num_messages=max_num_messages,
+                wait_time_seconds=wait_time_seconds,
+            ))
+            self.queue_policy.report(queue, bool(messages))
+            if messages:
+                return messages
+
+        return []
+
+    def handle_message(self, message: SqsMessage) -> bool:
+        """
+        Returns True if the message was handled successfully.
+        """
+        if self.is_duplicate(message):
+            message.delete()
+            return True
+
+        route = None
+        if self.router is not None:
+            route = self.router.match(message)
+
+        if self.is_expired(message, route=route):
+            self.shed_messages([message])
+            return True
+
+        if self.is_poisoned(message):
+            self.quarantine_messages([message])
+            return True
+
+        has_succeeded = False
+
+        if self.router is None:
+            with self.job_context(message=message) as job:
+                self.handle_job(job=job)
+                has_succeeded = True
+            return has_succeeded
+
+        if route is None:
+            self.router.handle_unmatched(message)
+            return True
+
+        # Keep holding the message while it waits for a free slot of the route
+        if self._heartbeat is not None:
+            hold_timeout = self._heartbeat.window
+        else:
+            hold_timeout = (route.timeout or self.default_timeout) + self._max_termination_time + 5
+        with route.slot(on_wait=lambda: message.hold(timeout=hold_timeout), interval=hold_timeout / 3):
+            with self.job_context(message=message, timeout=route.timeout, func=route.handler) as job:
+                self.handle_job(job=job, same_process=route.same_process)
+                has_succeeded = True
+        return has_succeeded
 
     @contextlib.contextmanager
     def job_context(
@@ -174,6 +661,7 @@ class Jobsy(LogMixin, RunLoopMixin):
         *,
         delete_on_failure=None,
         timeout: int = None,
+        func: Callable = None,
     ) -> Job:
         """
         Context manager that takes care of:
@@ -185,31 +673,236 @@ class Jobsy(LogMixin, RunLoopMixin):
         if timeout is None:
             timeout = self.default_timeout
 
-        if timeout is not None:
-            # Ensure that we hold on to the message for at least as long as the interval
-            # between checking on progress
-            message.hold(timeout=timeout + self._max_process_check_interval + 5)
+        if self._heartbeat is not None:
+            # Hold on to the message for a short window only, and keep extending it while the job is running
+            message.hold(timeout=self._heartbeat.window)
+            self._heartbeat.register(message)
+        elif timeout is not None:
+            # Ensure that we hold on to the message until the process has been stopped
+            message.hold(timeout=timeout + self._max_termination_time + 5)
 
         has_failed = None
 
         try:
-            yield self.create_job_from_message(message, timeout=timeout)
+            yield self.create_job_from_message(message, timeout=timeout, func=func)
         except Exception as exception:
             has_failed = True
+            self._stop_heartbeat(message)
             self.handle_failure(message=message, exception=exception)
             if delete_on_failure:
                 message.delete()
+            elif self.max_attempts or self.retry_delay_base:
+                self.retry_messages([message])
             else:
                 message.release()
         finally:
             if not has_failed:
+                self._stop_heartbeat(message)
+                if self.dedup is not None:
+                    self.dedup.add(message)
                 message.delete()
 
-    def create_job_from_message(self, message: SqsMessage, timeout: int = None) -> Job:
+    def is_duplicate(self, message: SqsMessage) -> bool:
+        if self.dedup is not None and message in self.dedup:
+            self.log.info(f"Skipping {message}, it has been handled already")
+            return True
+        return False
+
+    def handle_batch(self, messages: List[SqsMessage]):
+        duplicates = [message for message in messages if self.is_duplicate(message)]
+        if duplicates:
+            self._delete_messages(duplicates)
+            messages = [message for message in messages if message not in duplicates]
+
+        expired = [message for message in messages if self.is_expired(message)]
+        if expired:
+            self.shed_messages(expired)
+            messages = [message for message in messages if message not in expired]
+
+        poisoned = [message for message in messages if self.is_poisoned(message)]
+        if poisoned:
+            self.quarantine_messages(poisoned)
+            messages = [message for message in messages if message not in poisoned]
+
+        if not messages:
+            return
+
+        with self.batch_context(messages=messages) as job:
+            self.handle_job(job=job)
+
+    @contextlib.contextmanager
+    def batch_context(
+        self,
+        messages: List[SqsMessage],
+        *,
+        delete_on_failure=None,
+        timeout: int = None,
+    ) -> BatchJob:
+        """
+        Same as job_context(), for a batch of messages.
+        Once the job has run, deletes the messages it has handled successfully according to its result,
+        and releases (or deletes, if `delete_on_failure`) the rest. If the job fails, all messages have failed.
+        """
+        if delete_on_failure is None:
+            delete_on_failure = self.delete_on_failure
+        if timeout is None:
+            timeout = self.default_timeout
+
+        if self._heartbeat is not None:
+            self._change_visibility_timeouts(messages, timeout=self._heartbeat.window)
+            for message in messages:
+                self._heartbeat.register(message)
+        else:
+            self._change_visibility_timeouts(messages, timeout=timeout + self._max_termination_time + 5)
+
+        job = self.create_batch_job_from_messages(messages, timeout=timeout)
+        succeeded = [False] * len(messages)
+        exception = None
+
+        try:
+            yield job
+        except Exception as e:
+            exception = e
+        else:
+            if job.result is None:
+                succeeded = [True] * len(messages)
+            elif len(job.result) == len(messages):
+                succeeded = [bool(ok) for ok in job.result]
+            else:
+                exception = _JobFailed(f"Handler returned {len(job.result)} results for {len(messages)} messages")
+                self.log.error(str(exception))
+
+        for message in messages:
+            self._stop_heartbeat(message)
+
+        to_delete, failed = [], []
+        for message, ok in zip(messages, succeeded):
+            if ok and self.dedup is not None:
+                self.dedup.add(message)
+            if not ok:
+                self.handle_failure(message=message, exception=exception or _JobFailed())
+            if ok or delete_on_failure:
+                to_delete.append(message)
+            else:
+                failed.append(message)
+        self._delete_messages(to_delete)
+        self.retry_messages(failed)
+
+    def is_expired(self, message: SqsMessage, route: Route = None) -> bool:
+        """
+        True if the message is older than the max age of its route or queue.
+        """
+        max_age = None
+        if route is not None:
+            max_age = route.max_age
+        if max_age is None:
+            max_age = self.max_message_age.get(message.queue_url)
+        if max_age is None:
+            return False
+        age = message.age
+        return age is not None and age > max_age
+
+    def shed_messages(self, messages: List[SqsMessage]):
+        """
+        Skip, delete or divert expired messages according to `expired_action`.
+        """
+        self._count("expired", len(messages))
+        self.log.warning(f"Not handling {len(messages)} expired messages, action: {self.expired_action}")
+        if self.expired_action == "delete":
+            self._delete_messages(messages)
+        elif self.expired_action == "divert":
+            self._move_messages(messages, self.expired_queue)
+
+    def is_poisoned(self, message: SqsMessage) -> bool:
+        """
+        True if the message has been received more than `max_attempts` times
+        without being deleted, which means it shouldn't be handled again.
+        """
+        return bool(self.max_attempts and message.receive_count and message.receive_count > self.max_attempts)
+
+    def retry_messages(self, messages: List[SqsMessage]):
+        """
+        Make failed messages visible again, after an exponentially growing delay if `retry_delay_base` is set.
+        Messages which have used up all `max_attempts` are quarantined instead.
+        """
+        to_quarantine = []
+        delays: Dict[int, List[SqsMessage]] = collections.defaultdict(list)
+        for message in messages:
+            attempt = message.receive_count or 1
+            if self.max_attempts and attempt >= self.max_attempts:
+                to_quarantine.append(message)
+            elif self.retry_delay_base:
+                delays[min(self.retry_delay_max, self.retry_delay_base * 2 ** (attempt - 1))].append(message)
+            else:
+                delays[0].append(message)
+
+        for delay, delayed_messages in delays.items():
+            if delay:
+                self.log.info(f"Retrying {len(delayed_messages)} messages in {delay} seconds")
+            self._change_visibility_timeouts(delayed_messages, timeout=delay)
+        if to_quarantine:
+            self.quarantine_messages(to_quarantine)
+
+    def quarantine_messages(self, messages: List[SqsMessage]):
+        """
+        Move messages to `quarantine_queue`, or delete them if it is not set.
+        Messages which couldn't be sent there are released.
+        """
+        self._count("quarantined", len(messages))
+        if self.quarantine_queue is None:
+            self.log.error(f"Deleting {len(messages)} messages which have failed {self.max_attempts} times")
+            self._delete_messages(messages)
+            return
+
+        self.log.error(
+            f"Moving {len(messages)} messages which have failed {self.max_attempts} times to {self.quarantine_queue}"
+        )
+        self._move_messages(messages, self.quarantine_queue)
+
+    def _move_messages(self, messages: List[SqsMessage], queue: SqsQueue):
+        """
+        Forward the messages unchanged to `queue` and delete the ones that were sent. Release the rest.
+        """
+        results = queue.forward_messages(messages)
+        self._delete_messages([message for message, result in zip(messages, results) if result.ok])
+        self._change_visibility_timeouts([message for message, result in zip(messages, results) if not result.ok], 0)
+
+    def _delete_messages(self, messages: List[SqsMessage]):
+        for queue, queue_messages in self._group_by_queue(messages).items():
+            if queue.ack_buffer is not None:
+                for message in queue_messages:
+                    message.delete()
+            else:
+                queue.delete_messages(queue_messages)
+
+    def _change_visibility_timeouts(self, messages: List[SqsMessage], timeout: int):
+        for queue, queue_messages in self._group_by_queue(messages).items():
+            if queue.ack_buffer is not None:
+                for message in queue_messages:
+                    message.hold(timeout=timeout)
+            else:
+                queue.change_visibility_timeouts((message, timeout) for message in queue_messages)
+
+    def _group_by_queue(self, messages: List[SqsMessage]) -> Dict[SqsQueue, List[SqsMessage]]:
+        by_queue: Dict[SqsQueue, List[SqsMessage]] = collections.defaultdict(list)
+        for message in messages:
+            by_queue[message.queue].append(message)
+        return by_queue
+
+    def _count(self, metric: str, n: int = 1):
+        # Messages are handled in several threads when running with concurrency or message groups
+        with self._metrics_lock:
+            self.metrics[metric] += n
+
+    def _stop_heartbeat(self, message: SqsMessage):
+        if self._heartbeat is not None:
+            self._heartbeat.unregister(message)
+
+    def create_job_from_message(self, message: SqsMessage, timeout: int = None, func: Callable = None) -> Job:
         message_copy = message.copy()
         message_copy.queue_url = message.queue_url
         return Job(
-            func=self._job_runner or self.run_job,
+            func=func or self._job_runner or self.run_job,
             args=(),
             kwargs={
                 # Pass a copy based on the raw message. Queue object must not be passed as part of the message.
@@ -219,6 +912,23 @@ class Jobsy(LogMixin, RunLoopMixin):
             message=message,
         )
 
+    def create_batch_job_from_messages(self, messages: List[SqsMessage], timeout: int = None) -> BatchJob:
+        message_copies = []
+        for message in messages:
+            message_copy = message.copy()
+            message_copy.queue_url = message.queue_url
+            message_copies.append(message_copy)
+        return BatchJob(
+            func=self._job_runner or self.run_batch,
+            args=(),
+            kwargs={
+                "messages": message_copies,
+            },
+            timeout=timeout or self.default_timeout,
+            message=None,
+            messages=messages,
+        )
+
     def handle_failure(self, message: SqsMessage, exception: Exception, **kwargs):
         """
         Override this method as needed.
@@ -226,19 +936,38 @@ class Jobsy(LogMixin, RunLoopMixin):
         """
         pass
 
-    def handle_job(self, job: Job):
-        if self._same_process:
-            job.run_in_same_process(log=self.log)
+    def handle_job(self, job: Job, same_process: bool = None):
+        if same_process is None:
+            same_process = self._same_process
+        if same_process:
+            job.result = job.run_in_same_process(log=self.log)
+        elif self._pool is not None:
+            job.result = job.run_in_pool(pool=self._pool, log=self.log)
         else:
-            job.run_in_separate_process(log=self.log)
+            job.result = job.run_in_separate_process(log=self.log)
 
     def run_job(self, *args, **kwargs):
         raise NotImplementedError()
 
+    def run_batch(self, messages: List[SqsMessage]):
+        """
+        Override this method, or pass `job_runner_path`, to handle batches.
+        Return None if all messages were handled successfully, otherwise
+        a list with a truthy value for each message that was.
+        """
+        raise NotImplementedError()
+
 
 def main():
     parser = argparse.ArgumentParser(prog="python -m bwrapper.jobsy", description=__doc__)
-    parser.add_argument("--queue-url", action="append", dest="queue_urls")
+    parser.add_argument(
+        "--queue-url", action="append", dest="queue_urls",
+        help="URL of a queue to work on, optionally followed by :<weight> for the weighted and priority policies",
+    )
+    parser.add_argument(
+        "--queue-policy", default="round-robin", choices=list_queue_policies(),
+        help="[worker] How to choose the queue to take the next message from",
+    )
     parser.add_argument(
         "--same-process", action="store_true",
         help="[worker] Run jobs in the same process (timeouts not supported)",
@@ -248,9 +977,120 @@ def main():
         "--max-iterations", type=int, default=None,
         help="[worker] Maximum number of iterations to run the worker before exiting",
     )
+    parser.add_argument(
+        "--buffer-acks", action="store_true",
+        help="[worker] Send message deletions and visibility changes in batches",
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=0,
+        help="[worker] Receive messages in the background, buffering up to this many locally",
+    )
+    parser.add_argument(
+        "--poll-concurrently", action="store_true",
+        help="[worker] Long-poll all queues at the same time instead of one after another",
+    )
+    parser.add_argument(
+        "--max-poll-connections", type=int, default=None,
+        help="[worker] Maximum number of queues polled at the same time (default: all)",
+    )
+    parser.add_argument(
+        "--wait-time-seconds", type=int, default=20,
+        help="[worker] How long each ReceiveMessage call waits for messages to arrive",
+    )
+    parser.add_argument(
+        "--pool-size", type=int, default=0,
+        help="[worker] Run jobs in this many long-lived worker processes instead of a new process per job",
+    )
+    parser.add_argument(
+        "--worker-initializer-path",
+        help="[worker] 'module.function' path to the function called once in every pool worker process",
+    )
+    parser.add_argument(
+        "--max-tasks-per-child", type=int, default=None,
+        help="[worker] Replace pool worker processes after they have run this many jobs",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=1,
+        help="[worker] Maximum number of jobs to run at the same time",
+    )
+    parser.add_argument(
+        "--fifo-groups", action="store_true",
+        help="[worker] Handle messages of different FIFO message groups concurrently (up to --concurrency groups)",
+    )
+    parser.add_argument(
+        "--dedup", action="store_true",
+        help="[worker] Remember IDs of handled messages and skip their duplicate deliveries",
+    )
+    parser.add_argument(
+        "--dedup-ttl", type=float, default=3600,
+        help="[worker] How many seconds to remember handled message IDs for",
+    )
+    parser.add_argument(
+        "--dedup-max-size", type=int, default=10000,
+        help="[worker] Maximum number of handled message IDs to remember",
+    )
+    parser.add_argument(
+        "--dedup-path",
+        help="[worker] File to persist handled message IDs to, so that they survive restarts",
+    )
+    parser.add_argument(
+        "--max-attempts", type=int, default=None,
+        help="[worker] Quarantine messages once they have failed this many times",
+    )
+    parser.add_argument(
+        "--quarantine-queue-url",
+        help="[worker] URL of the queue to move messages which have failed --max-attempts times to (default: delete them)",
+    )
+    parser.add_argument(
+        "--retry-delay-base", type=int, default=None,
+        help="[worker] Retry failed messages after this many seconds, doubled after every attempt",
+    )
+    parser.add_argument(
+        "--retry-delay-max", type=int, default=900,
+        help="[worker] Longest delay before retrying a failed message",
+    )
+    parser.add_argument(
+        "--max-message-age", type=float, default=None,
+        help="[worker] Don't handle messages sent longer than this many seconds ago",
+    )
+    parser.add_argument(
+        "--expired-action", default="delete", choices=["skip", "delete", "divert"],
+        help="[worker] What to do with messages older than --max-message-age",
+    )
+    parser.add_argument(
+        "--expired-queue-url",
+        help="[worker] URL of the queue to divert messages older than --max-message-age to",
+    )
+    parser.add_argument(
+        "--heartbeat-window", type=int, default=None,
+        help="[worker] Hold messages for this many seconds at a time, extending it while their jobs are running",
+    )
+    parser.add_argument(
+        "--adaptive-sleep", action="store_true",
+        help="[worker] Don't sleep between iterations while there is work, back off exponentially when idle",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=None,
+        help="[worker] Call the handler with lists of up to this many messages (as messages=...)",
+    )
+    parser.add_argument(
+        "--batch-wait", type=float, default=1.0,
+        help="[worker] How long to wait for more messages to fill a batch once the first ones have arrived",
+    )
     parser.add_argument(
         "--handler-path",
-        help="'module.function' path to the function that handles messages",
+        help="'module.function' path to the function that handles messages (that match no --route)",
+    )
+    parser.add_argument(
+        "--route", action="append", dest="routes", metavar="VALUE=module.function",
+        help=(
+            "[worker] Handle messages whose --route-attribute (or SNS topic ARN) is VALUE with this function. "
+            "Messages that match no route are handled by --handler-path if it is set, otherwise dropped"
+        ),
+    )
+    parser.add_argument(
+        "--route-attribute",
+        help="[worker] Name of the message attribute to route messages by",
     )
 
     args = parser.parse_args()
@@ -263,19 +1103,62 @@ def main():
     logging.getLogger("botocore").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.INFO)
 
-    queues: List[SqsQueue]
-    if not args.queue_urls:
-        queues = [SqsQueue(url=os.environ["SQS_QUEUE_URL"])]
-    else:
-        queues = [SqsQueue(url=url) for url in args.queue_urls]
+    queues: List[SqsQueue] = []
+    queue_weights: Dict[str, int] = {}
+    for queue_url_arg in args.queue_urls or [os.environ["SQS_QUEUE_URL"]]:
+        url, weight = parse_queue_url_arg(queue_url_arg)
+        queues.append(SqsQueue(url=url, wait_time_seconds=args.wait_time_seconds))
+        if weight is not None:
+            queue_weights[url] = weight
+
+    router: Router = None
+    if args.routes:
+        routes: Dict[str, Route] = {}
+        for route_arg in args.routes:
+            value, handler_path = route_arg.rsplit("=", 1)
+            routes[value] = Route(handler_path=handler_path)
+        router = Router(
+            routes,
+            attribute=args.route_attribute,
+            default=Route(handler_path=args.handler_path) if args.handler_path else None,
+        )
+
+    dedup: IdempotencyCache = None
+    if args.dedup or args.dedup_path:
+        dedup = IdempotencyCache(max_size=args.dedup_max_size, ttl=args.dedup_ttl, path=args.dedup_path)
 
     jobsy = Jobsy(
         queues,
         same_process=args.same_process,
         max_iterations=args.max_iterations,
         job_runner_path=args.handler_path,
+        buffer_acks=args.buffer_acks,
+        prefetch=args.prefetch,
+        poll_concurrently=args.poll_concurrently,
+        max_poll_connections=args.max_poll_connections,
+        pool_size=args.pool_size,
+        worker_initializer_path=args.worker_initializer_path,
+        max_tasks_per_child=args.max_tasks_per_child,
+        concurrency=args.concurrency,
+        heartbeat_window=args.heartbeat_window,
+        adaptive_sleep=args.adaptive_sleep,
+        queue_policy=args.queue_policy,
+        queue_weights=queue_weights,
+        router=router,
+        batch_size=args.batch_size,
+        batch_wait=args.batch_wait,
+        fifo_groups=args.fifo_groups,
+        dedup=dedup,
+        max_attempts=args.max_attempts,
+        quarantine_queue=args.quarantine_queue_url,
+        retry_delay_base=args.retry_delay_base,
+        retry_delay_max=args.retry_delay_max,
+        max_message_age=args.max_message_age,
+        expired_action=args.expired_action,
+        expired_queue=args.expired_queue_url,
     )
     jobsy.log.setLevel(log_level)
+    signal.signal(signal.SIGTERM, lambda signum, frame: jobsy.run_loop.stop())
     jobsy.run()
 
 
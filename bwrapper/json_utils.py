@@ -1,29 +1,186 @@
 import datetime as dt
 import decimal
 import json
+import math
+import re
+from typing import Any, Dict, List
+
+
+def _default(obj):
+    if isinstance(obj, dt.datetime):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        obj_str = str(obj)
+        if "." in obj_str:
+            return float(obj)
+        else:
+            return int(obj)
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
 
 class JsonEncoder(json.JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, dt.datetime):
-            return str(obj)
-        if isinstance(obj, decimal.Decimal):
-            obj_str = str(obj)
-            if "." in obj_str:
-                return float(obj)
-            else:
-                return int(obj)
+        if isinstance(obj, (dt.datetime, decimal.Decimal)):
+            return _default(obj)
         return json.JSONEncoder.default(self, obj)
 
 
+class JsonCodec:
+    """
+    Base class of JSON backends.
+    Implementations must produce and accept the same JSON as the standard library
+    (including datetimes and Decimals serialised by JsonEncoder, and NaN and Infinity),
+    raise TypeError for the same values, and raise a ValueError subclass when decoding invalid JSON.
+    """
+
+    name: str = None
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> str:
+        raise NotImplementedError()
+
+    def loads(self, obj_str: str) -> Any:
+        raise NotImplementedError()
+
+
+class StdlibJsonCodec(JsonCodec):
+    name = "json"
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> str:
+        return json.dumps(obj, cls=JsonEncoder, sort_keys=sort_keys)
+
+    def loads(self, obj_str: str) -> Any:
+        return json.loads(obj_str)
+
+
+# 19 digits in a row may be an integer which doesn't fit in 64 bits
+_LONG_DIGITS_RE = re.compile(r"\d{19}")
+
+_PLAIN_TYPES = (str, int, bool, type(None))
+
+
+def _encodes_like_stdlib(obj: Any) -> bool:
+    """
+    False if `obj` contains anything that orjson would encode differently from the standard library:
+    non-finite floats (orjson writes null instead of NaN and Infinity), and values or keys of types
+    orjson encodes natively but the standard library refuses (UUIDs, enums, ...) or vice versa (subclasses).
+    """
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type in _PLAIN_TYPES:
+            continue
+        if value_type is float:
+            if not math.isfinite(value):
+                return False
+        elif value_type is dict:
+            for key in value:
+                key_type = type(key)
+                if key_type not in _PLAIN_TYPES and not (key_type is float and math.isfinite(key)):
+                    return False
+            stack.extend(value.values())
+        elif value_type is list or value_type is tuple:
+            stack.extend(value)
+        elif not isinstance(value, (dt.datetime, decimal.Decimal)):
+            return False
+    return True
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        # Let _default() handle datetimes and dataclasses so that results match the standard library.
+        self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any, *, sort_keys: bool = False) -> str:
+        if not _encodes_like_stdlib(obj):
+            return json.dumps(obj, cls=JsonEncoder, sort_keys=sort_keys)
+        options = self._options
+        if sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        try:
+            return self._orjson.dumps(obj, default=_default, option=options).decode("utf-8")
+        except self._orjson.JSONEncodeError:
+            # orjson refuses some values the standard library accepts, e.g. integers over 64 bits.
+            return json.dumps(obj, cls=JsonEncoder, sort_keys=sort_keys)
+
+    def loads(self, obj_str: str) -> Any:
+        if _LONG_DIGITS_RE.search(obj_str):
+            # orjson decodes integers over 64 bits as floats, the standard library keeps them exact.
+            return json.loads(obj_str)
+        try:
+            return self._orjson.loads(obj_str)
+        except self._orjson.JSONDecodeError:
+            # orjson rejects some input the standard library accepts, e.g. NaN and Infinity.
+            # Invalid JSON still raises a ValueError, from the standard library.
+            return json.loads(obj_str)
+
+
+# Registered codecs by name, in the order of preference
+_codecs: Dict[str, type] = {}
+_codec: JsonCodec = None
+
+
+def register_codec(codec_cls: type, *, preferred: bool = False):
+    """
+    Register a JsonCodec subclass.
+    Codecs whose __init__ raises ImportError are skipped when auto-selecting a codec.
+    """
+    global _codecs
+    if preferred:
+        _codecs = {codec_cls.name: codec_cls, **_codecs}
+    else:
+        _codecs[codec_cls.name] = codec_cls
+
+
+def list_codecs() -> List[str]:
+    return list(_codecs)
+
+
+def set_codec(name: str) -> JsonCodec:
+    """
+    Select the codec used for all JSON encoding and decoding in bwrapper.
+    """
+    global _codec
+    _codec = _codecs[name]()
+    return _codec
+
+
+def get_codec() -> JsonCodec:
+    """
+    Returns the selected codec; on first call, selects the first registered codec that can be used.
+    """
+    global _codec
+    if _codec is None:
+        for codec_cls in _codecs.values():
+            try:
+                _codec = codec_cls()
+                break
+            except ImportError:
+                continue
+    return _codec
+
+
+register_codec(OrjsonCodec)
+register_codec(StdlibJsonCodec)
+
+
 def to_json(obj, **kwargs):
-    kwargs.setdefault("cls", JsonEncoder)
     if obj is None:
         return None
+    if set(kwargs) <= {"sort_keys"}:
+        return get_codec().dumps(obj, **kwargs)
+    # Options not supported by codecs (indent etc.) are handled by the standard library.
+    kwargs.setdefault("cls", JsonEncoder)
     return json.dumps(obj, **kwargs)
 
 
 def from_json(obj_str: str, **kwargs):
     if obj_str is None:
         return None
+    if not kwargs:
+        return get_codec().loads(obj_str)
     return json.loads(obj_str, **kwargs)
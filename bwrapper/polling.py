@@ -0,0 +1,140 @@
+import collections
+import concurrent.futures
+import threading
+import time
+from typing import Deque, Dict, List, Optional
+
+from bwrapper.log import LogMixin
+from bwrapper.prefetch import Prefetched, release_after_close
+from bwrapper.sqs import SqsMessage, SqsQueue
+
+
+class ConcurrentPoller(LogMixin):
+    """
+    Long-polls several queues at the same time and hands out whichever message arrives first.
+
+    Each queue is polled with its own `wait_time_seconds`. Polls which are still in flight
+    when a message is handed out keep running and their results are picked up by
+    subsequent calls, so no long poll is wasted.
+
+    At most `max_connections` polls are in flight at any time, the others wait for a free connection.
+
+    Like SqsPrefetcher, the poller knows when the visibility timeout of each received message runs out.
+    Messages with less than `min_time_left` seconds left when they would be handed out are released instead.
+    """
+
+    def __init__(
+        self,
+        queues: List[SqsQueue],
+        *,
+        max_connections: int = None,
+        min_time_left: float = 5,
+        visibility_timeout: int = None,
+    ):
+        self.queues = list(queues)
+        self.max_connections = max_connections or len(self.queues)
+        self.min_time_left = min_time_left
+
+        # If not set, the default visibility timeout of each queue is used.
+        self.visibility_timeout = visibility_timeout
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_connections,
+            thread_name_prefix=self.__class__.__name__,
+        )
+        self._polls: Dict[concurrent.futures.Future, SqsQueue] = {}
+        self._received: Deque[Prefetched] = collections.deque()
+        self._lock = threading.Lock()
+        self._is_closed = False
+
+    def receive_message(self, timeout: float = None) -> Optional[SqsMessage]:
+        """
+        Returns the first message received from any of the queues, or None if
+        no message arrived within `timeout` seconds (defaults to the longest wait time of all queues).
+        """
+        if timeout is None:
+            timeout = max(q.wait_time_seconds for q in self.queues)
+        deadline = time.time() + timeout
+
+        with self._lock:
+            if self._is_closed:
+                return None
+            self._release_expiring()
+            while not self._received:
+                self._start_polls()
+                remaining = deadline - time.time()
+                done, _ = concurrent.futures.wait(
+                    list(self._polls),
+                    timeout=max(0.0, remaining),
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    self._collect(future)
+                self._release_expiring()
+                if remaining <= 0:
+                    break
+
+            if self._received:
+                return self._received.popleft().message
+            return None
+
+    def _start_polls(self):
+        polled = set(self._polls.values())
+        for queue in self.queues:
+            if queue not in polled:
+                self._polls[self._executor.submit(self._poll, queue)] = queue
+
+    def _poll(self, queue: SqsQueue) -> List[Prefetched]:
+        visibility_timeout = self.visibility_timeout or queue.visibility_timeout
+        received_at = time.time()
+        return [
+            Prefetched(message=message, expires_at=received_at + visibility_timeout)
+            for message in queue.receive_messages(max_num_messages=1)
+        ]
+
+    def _release_expiring(self):
+        """
+        Release received messages which are about to become visible to other consumers,
+        for example after they were carried over while a long job was running.
+        Must be called while holding the lock.
+        """
+        expiring = [p for p in self._received if p.time_left < self.min_time_left]
+        for prefetched in expiring:
+            self._received.remove(prefetched)
+            self.log.debug(f"Releasing {prefetched.message}, visibility timeout is about to expire")
+            try:
+                prefetched.message.release()
+            except Exception as e:
+                self.log.warning(f"Releasing {prefetched.message} failed: {e}")
+
+    def _collect(self, future: concurrent.futures.Future):
+        queue = self._polls.pop(future)
+        try:
+            self._received.extend(future.result())
+        except Exception as e:
+            self.log.warning(f"Receiving messages from {queue} failed: {e}")
+
+    def close(self):
+        """
+        Stop polling. Messages that have been received but not handed out are released.
+        """
+        with self._lock:
+            self._is_closed = True
+            for future in list(self._polls):
+                if future.cancel():
+                    del self._polls[future]
+                else:
+                    future.add_done_callback(self._release_on_completion)
+            received = list(self._received)
+            self._received.clear()
+        for prefetched in received:
+            prefetched.message.release()
+        self._executor.shutdown(wait=False)
+
+    def _release_on_completion(self, future: concurrent.futures.Future):
+        try:
+            received = future.result()
+        except Exception:
+            return
+        for prefetched in received:
+            release_after_close(prefetched.message)
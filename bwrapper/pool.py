@@ -0,0 +1,213 @@
+import multiprocessing
+import multiprocessing.connection
+import pickle
+import queue
+import threading
+import traceback
+from typing import Callable, Dict, List, Tuple
+
+from bwrapper.log import LogMixin
+
+
+def _worker_main(conn: multiprocessing.connection.Connection, initializer: Callable, initargs: Tuple, max_tasks: int):
+    """
+    Main loop of a worker process: receive (func, args, kwargs), call it, send back ("ok", result)
+    or ("error", formatted traceback). Exits when it receives None or after `max_tasks` tasks.
+    """
+    if initializer is not None:
+        initializer(*initargs)
+
+    num_tasks = 0
+    while not max_tasks or num_tasks < max_tasks:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        func, args, kwargs = task
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+        else:
+            try:
+                conn.send(("ok", result))
+            except Exception:
+                # Result can't be pickled, the job itself has still succeeded
+                conn.send(("ok", None))
+        num_tasks += 1
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, pool: "WorkerPool"):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = pool.mp_context.Process(
+            target=_worker_main,
+            args=(child_conn, pool.initializer, pool.initargs, pool.max_tasks_per_child),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.num_tasks = 0
+
+    def stop(self, timeout: float = 3.0):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(3.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool(LogMixin):
+    """
+    Keeps `size` long-lived worker processes and runs jobs in them, one job per worker at a time.
+    Jobs are sent to workers over pipes, so functions and their arguments must be picklable
+    (functions must be importable at module level).
+
+    `initializer(*initargs)` is called once in every worker process when it starts,
+    which is the place to load models or open connections that jobs reuse.
+    Workers are replaced after `max_tasks_per_child` jobs, and when a job times out or crashes the worker.
+    """
+
+    class JobFailed(Exception):
+        """
+        Raised when the job raised an exception, timed out or its worker died.
+        """
+
+    def __init__(
+        self,
+        size: int,
+        *,
+        initializer: Callable = None,
+        initargs: Tuple = (),
+        max_tasks_per_child: int = None,
+        mp_context=None,
+    ):
+        self.size = size
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_tasks_per_child = max_tasks_per_child
+        self.mp_context = mp_context or multiprocessing.get_context()
+
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._is_closed = False
+
+    @staticmethod
+    def check_picklable(func: Callable):
+        """
+        Raise ValueError if `func` can't be sent to worker processes.
+        Bound methods of objects holding locks or connections, lambdas and local functions can't.
+        """
+        try:
+            pickle.dumps(func)
+        except Exception as e:
+            raise ValueError(f"{func!r} can't be run in a worker pool, it can't be pickled: {e}") from e
+
+    def start(self):
+        with self._lock:
+            while len(self._workers) < self.size:
+                self._add_worker()
+
+    def _add_worker(self):
+        """
+        Must be called while holding the lock.
+        """
+        worker = _Worker(self)
+        self._workers.append(worker)
+        self._idle.put(worker)
+        self.log.debug(f"Started worker process {worker.process.pid}")
+
+    def _replace_worker(self, worker: _Worker):
+        with self._lock:
+            self._workers.remove(worker)
+            if not self._is_closed:
+                self._add_worker()
+
+    def run(self, func: Callable, args: Tuple = (), kwargs: Dict = None, *, timeout: float = None):
+        """
+        Run func(*args, **kwargs) in a worker process, wait for it to complete and return its result.
+        Blocks until a worker is free. Raises WorkerPool.JobFailed if the job did not complete successfully.
+        """
+        if self._is_closed:
+            raise RuntimeError(f"{self} is closed")
+        self.start()
+
+        worker = self._idle.get()
+        try:
+            worker.conn.send((func, args, kwargs or {}))
+        except (BrokenPipeError, OSError) as e:
+            self._replace_worker(worker)
+            raise self.JobFailed(f"Worker {worker.process.pid} is gone: {e}")
+        except Exception as e:
+            # The task couldn't be pickled, nothing has been sent so the worker can take the next one
+            self._idle.put(worker)
+            raise self.JobFailed(f"Job can't be sent to a worker process: {e}")
+
+        ready = multiprocessing.connection.wait([worker.conn, worker.process.sentinel], timeout=timeout)
+
+        status = None
+        if worker.conn in ready:
+            try:
+                status, details = worker.conn.recv()
+            except EOFError:
+                pass
+
+        if status is not None:
+            worker.num_tasks += 1
+            if self.max_tasks_per_child and worker.num_tasks >= self.max_tasks_per_child:
+                self.log.debug(f"Recycling worker {worker.process.pid} after {worker.num_tasks} tasks")
+                worker.stop()
+                self._replace_worker(worker)
+            else:
+                self._idle.put(worker)
+            if status != "ok":
+                raise self.JobFailed(details)
+            return details
+
+        if ready:
+            worker.kill()
+            self.log.error(f"Worker {worker.process.pid} died with exit code {worker.process.exitcode}")
+            self._replace_worker(worker)
+            raise self.JobFailed(f"worker exited with code {worker.process.exitcode}")
+
+        self.log.warning(f"Job in worker {worker.process.pid} has timed out after {timeout} seconds, terminating it")
+        worker.kill()
+        self._replace_worker(worker)
+        raise self.JobFailed(f"timed out after {timeout} seconds")
+
+    def close(self):
+        """
+        Stop all worker processes once they have completed their current jobs.
+        """
+        with self._lock:
+            self._is_closed = True
+        while True:
+            with self._lock:
+                if not self._workers:
+                    return
+            try:
+                worker = self._idle.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            worker.stop()
+            with self._lock:
+                self._workers.remove(worker)
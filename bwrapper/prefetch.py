@@ -0,0 +1,159 @@
+import collections
+import dataclasses
+import itertools
+import logging
+import threading
+import time
+from typing import Deque, List, Optional
+
+from bwrapper.log import LogMixin
+from bwrapper.sqs import SqsMessage, SqsQueue
+
+log = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class Prefetched:
+    message: SqsMessage
+
+    # time.time() at which the message becomes visible to other consumers again
+    expires_at: float
+
+    @property
+    def time_left(self) -> float:
+        return self.expires_at - time.time()
+
+
+def release_after_close(message: SqsMessage):
+    """
+    Release a message whose receive call completed after its receiver had been closed.
+    The message is released directly, not through the ack buffer of its queue, which may have been closed by now.
+    """
+    try:
+        message.queue.release_message(message)
+    except Exception as e:
+        log.warning(f"Releasing {message} failed: {e}")
+
+
+class SqsPrefetcher(LogMixin):
+    """
+    Receives messages in the background, up to 10 per ReceiveMessage call,
+    and keeps them in a bounded local buffer until they are taken with get().
+
+    The prefetcher knows when the visibility timeout of each buffered message
+    runs out. Messages which have less than `min_time_left` seconds left are released
+    back to the queue instead of being handed out, so that another consumer can pick them up.
+    """
+
+    def __init__(
+        self,
+        queues: List[SqsQueue],
+        *,
+        max_size: int = 10,
+        min_time_left: float = 5,
+        visibility_timeout: int = None,
+    ):
+        self.queues = list(queues)
+        self.max_size = max_size
+        self.min_time_left = min_time_left
+
+        # If not set, the default visibility timeout of each queue is used.
+        self.visibility_timeout = visibility_timeout
+
+        self._buffer: Deque[Prefetched] = collections.deque()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread = None
+        self._is_stopped = False
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.__class__.__name__}", daemon=True)
+            self._thread.start()
+
+    def get(self, timeout: float = None) -> Optional[SqsMessage]:
+        """
+        Take the next buffered message, waiting up to `timeout` seconds for one to arrive.
+        Returns None if no message was available in time.
+        """
+        self.start()
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                self._release_expiring()
+                if self._buffer:
+                    prefetched = self._buffer.popleft()
+                    self._cond.notify_all()
+                    return prefetched.message
+                if self._is_stopped:
+                    return None
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+
+    def _run(self):
+        for queue in itertools.cycle(self.queues):
+            with self._cond:
+                while not self._is_stopped and len(self._buffer) >= self.max_size:
+                    self._release_expiring()
+                    self._cond.wait(1.0)
+                if self._is_stopped:
+                    return
+                num_free = self.max_size - len(self._buffer)
+
+            try:
+                received = self._receive(queue, max_num_messages=min(10, num_free))
+            except Exception as e:
+                self.log.warning(f"Receiving messages from {queue} failed: {e}")
+                time.sleep(1.0)
+                continue
+
+            with self._cond:
+                if self._is_stopped:
+                    for prefetched in received:
+                        release_after_close(prefetched.message)
+                    return
+                self._buffer.extend(received)
+                self._cond.notify_all()
+
+    def _receive(self, queue: SqsQueue, max_num_messages: int) -> List[Prefetched]:
+        visibility_timeout = self.visibility_timeout or queue.visibility_timeout
+        received_at = time.time()
+        return [
+            Prefetched(message=message, expires_at=received_at + visibility_timeout)
+            for message in queue.receive_messages(max_num_messages=max_num_messages)
+        ]
+
+    def _release_expiring(self):
+        """
+        Release messages we would not be able to start working on in time.
+        Must be called while holding the lock.
+        """
+        # Queues may have different visibility timeouts so the buffer isn't necessarily ordered by expiry.
+        expiring = [p for p in self._buffer if p.time_left < self.min_time_left]
+        for prefetched in expiring:
+            self._buffer.remove(prefetched)
+            self.log.debug(f"Releasing {prefetched.message}, visibility timeout is about to expire")
+            try:
+                prefetched.message.release()
+            except Exception as e:
+                self.log.warning(f"Releasing {prefetched.message} failed: {e}")
+
+    def close(self):
+        """
+        Stop receiving and release all buffered messages.
+        Messages received by a call still in flight are released when it completes.
+        """
+        with self._cond:
+            self._is_stopped = True
+            buffered = list(self._buffer)
+            self._buffer.clear()
+            self._cond.notify_all()
+        for prefetched in buffered:
+            prefetched.message.release()
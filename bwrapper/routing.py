@@ -0,0 +1,126 @@
+"""
+Routing of messages to handlers by a message attribute, or by topic ARN for SNS notifications.
+"""
+
+import contextlib
+import threading
+from typing import Callable, Dict, Union
+
+from bwrapper.log import LogMixin
+from bwrapper.sqs import SqsMessage, SqsQueue
+
+
+class Route:
+    """
+    Where and how to handle the messages matched by a router.
+
+    `handler` (or the function at `handler_path`) is called as handler(message=message).
+    `timeout`, `same_process` and `max_age` override the Jobsy defaults for this route only.
+    If `concurrency` is set, at most this many messages of this route are handled at the same time,
+    the rest are kept held while they wait for a free slot.
+    """
+
+    def __init__(
+        self,
+        handler: Callable = None,
+        *,
+        handler_path: str = None,
+        timeout: int = None,
+        concurrency: int = None,
+        same_process: bool = None,
+        max_age: float = None,
+    ):
+        if handler is None:
+            from bwrapper.jobsy import resolve_func_call
+            handler = resolve_func_call(func_path=handler_path)
+        self.handler = handler
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.same_process = same_process
+        self.max_age = max_age
+
+        self._slots: threading.BoundedSemaphore = None
+        if concurrency:
+            self._slots = threading.BoundedSemaphore(concurrency)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {getattr(self.handler, '__qualname__', self.handler)}>"
+
+    @contextlib.contextmanager
+    def slot(self, *, on_wait: Callable[[], None] = None, interval: float = None):
+        """
+        Wait for a free slot of the route.
+        If no slot is free right away, `on_wait()` is called before waiting
+        and then every `interval` seconds until a slot is free, so that the caller
+        can keep holding the message that is waiting.
+        """
+        if self._slots is None:
+            yield
+            return
+        if not self._slots.acquire(blocking=False):
+            while True:
+                if on_wait is not None:
+                    on_wait()
+                if self._slots.acquire(timeout=interval):
+                    break
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+class Router(LogMixin):
+    """
+    Maps messages to routes by the value of message attribute `attribute`
+    or, for SNS notifications, by the topic ARN.
+
+    Messages that match no route go to the `default` route if there is one.
+    Otherwise they are deleted (`unmatched="drop"`) or forwarded unchanged to another queue
+    (`unmatched=<SqsQueue>`) and deleted, without a job being created for them.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, Route],
+        *,
+        attribute: str = None,
+        default: Route = None,
+        unmatched: Union[str, SqsQueue] = "drop",
+    ):
+        self.routes = dict(routes)
+        self.attribute = attribute
+        self.default = default
+        if isinstance(unmatched, str) and unmatched != "drop":
+            unmatched = SqsQueue(url=unmatched)
+        self.unmatched = unmatched
+
+    def get_key(self, message: SqsMessage) -> str:
+        """
+        The body is only decoded (and an offloaded body fetched) to look for a topic ARN
+        if the message doesn't have the routing attribute.
+        """
+        if self.attribute and message.attributes:
+            key = message.attributes.get(self.attribute)
+            if key is not None:
+                return key
+        if message.is_sns_notification:
+            return message.body.get("TopicArn")
+        return None
+
+    def match(self, message: SqsMessage) -> Route:
+        """
+        Returns None if the message matches no route and there is no default route.
+        """
+        return self.routes.get(self.get_key(message), self.default)
+
+    def handle_unmatched(self, message: SqsMessage):
+        if self.unmatched == "drop":
+            self.log.warning(f"Dropping {message}, it matches no route")
+        else:
+            self.log.info(f"Forwarding {message} to {self.unmatched}, it matches no route")
+            result, = self.unmatched.forward_messages([message])
+            if not result.ok:
+                self.log.warning(f"Forwarding {message} failed, releasing it")
+                message.release()
+                return
+        message.delete()
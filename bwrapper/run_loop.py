@@ -1,4 +1,6 @@
 import dataclasses
+import random
+import threading
 import time
 from typing import Callable, List
 
@@ -12,9 +14,23 @@ class RunLoop(LogMixin):
     max_iterations: int = 0
     timeout: float = 0
     raise_on_timeout: bool = False
+
+    # If set to True, `sleep` is ignored. Iterations that did work (callback returned True)
+    # are followed immediately by the next one, idle iterations by a sleep which starts at
+    # `idle_sleep_min` and grows `idle_backoff` times with every consecutive idle iteration,
+    # up to `idle_sleep_max`, randomised by +/- `idle_jitter` (a fraction of the sleep).
+    adaptive: bool = False
+    idle_sleep_min: float = 0.1
+    idle_sleep_max: float = 30
+    idle_backoff: float = 2.0
+    idle_jitter: float = 0.1
+
     current_iteration: int = dataclasses.field(default=None, init=False)
     start_time: float = dataclasses.field(default=None, init=False)
     _is_stopped: bool = dataclasses.field(default=False, init=False)
+    _num_idle_iterations: int = dataclasses.field(default=0, init=False)
+    _has_reported: bool = dataclasses.field(default=False, init=False)
+    _stop_event: threading.Event = dataclasses.field(default_factory=threading.Event, init=False, repr=False)
 
     # List of callable predicates which all should return True in order for the run loop to continue.
     # Register new ones with run_loop.predicates.append(predicate)
@@ -61,19 +77,49 @@ class RunLoop(LogMixin):
 
         self.current_iteration += 1
 
-        self.log.debug("Sleeping")
-        time.sleep(self.first_sleep if self.current_iteration == 1 else self.sleep)
-        return True
+        sleep = self.first_sleep if self.current_iteration == 1 else self.next_sleep()
+        if sleep > 0:
+            self.log.debug(f"Sleeping for {sleep:.2f}s")
+            # Wakes up early if stop() is called
+            self._stop_event.wait(sleep)
+        return not self._is_stopped
+
+    def next_sleep(self) -> float:
+        """
+        How long to sleep before the next iteration.
+        """
+        if not self.adaptive:
+            return self.sleep
+        if self._num_idle_iterations == 0:
+            return 0
+        sleep = min(self.idle_sleep_max, self.idle_sleep_min * self.idle_backoff ** (self._num_idle_iterations - 1))
+        return sleep * random.uniform(1 - self.idle_jitter, 1 + self.idle_jitter)
+
+    def report(self, did_work: bool):
+        """
+        Report whether the last iteration did any work. Only matters if `adaptive` is set.
+        """
+        self._has_reported = True
+        if did_work:
+            self._num_idle_iterations = 0
+        else:
+            self._num_idle_iterations += 1
 
     def loop_over(self, callback: Callable):
         """
         Repeatedly calls the callback as long as should_run() returns True.
+        The callback should return True if it did any work, see `adaptive`,
+        unless it has called report() itself.
         """
         while self.should_run():
-            callback()
+            self._has_reported = False
+            did_work = callback()
+            if not self._has_reported:
+                self.report(bool(did_work))
 
     def stop(self):
         self._is_stopped = True
+        self._stop_event.set()
 
 
 class RunLoopMixin:
@@ -81,6 +127,7 @@ class RunLoopMixin:
     run_loop_first_sleep = 0
     run_loop_max_iterations = RunLoop.max_iterations
     run_loop_timeout = 0
+    run_loop_adaptive = False
 
     class _RunLoop:
         def __get__(self, instance, owner):
@@ -92,6 +139,7 @@ class RunLoopMixin:
                     first_sleep=instance.run_loop_first_sleep,
                     max_iterations=instance.run_loop_max_iterations,
                     timeout=instance.run_loop_timeout,
+                    adaptive=instance.run_loop_adaptive,
                 ))
             return getattr(instance, "_run_loop")
 
@@ -0,0 +1,160 @@
+"""
+Policies deciding which queues Jobsy polls, in which order and for how long.
+"""
+
+import itertools
+import time
+from typing import Dict, Iterator, List, Tuple, Union
+
+from bwrapper.sqs import SqsQueue
+
+
+class QueuePolicy:
+    """
+    Base class of queue selection policies.
+
+    plan() yields (queue, wait_time_seconds) pairs which are polled in order until one of them
+    returns messages. report() is called after every poll.
+    """
+
+    name: str = None
+
+    def __init__(self, queues: List[SqsQueue], *, weights: Dict[str, int] = None):
+        self.queues = list(queues)
+
+        # Weights (or priorities) by queue URL, 1 if not specified
+        self.weights = {q: (weights or {}).get(q.url, 1) for q in self.queues}
+
+    def plan(self) -> Iterator[Tuple[SqsQueue, int]]:
+        raise NotImplementedError()
+
+    def report(self, queue: SqsQueue, received: bool):
+        pass
+
+
+class RoundRobinPolicy(QueuePolicy):
+    """
+    Poll all queues in turn, each with its own wait time.
+    """
+
+    name = "round-robin"
+
+    def __init__(self, queues: List[SqsQueue], **kwargs):
+        super().__init__(queues, **kwargs)
+        self._queues_generator: Iterator[SqsQueue] = itertools.cycle(self.queues)
+
+    def plan(self) -> Iterator[Tuple[SqsQueue, int]]:
+        for _ in range(len(self.queues)):
+            queue = next(self._queues_generator)
+            yield queue, queue.wait_time_seconds
+
+
+class StrictPriorityPolicy(QueuePolicy):
+    """
+    Always take messages from the queue with the highest weight that has any.
+    All queues are checked with short polls first so that empty low-priority queues
+    never delay high-priority ones, then the highest-priority queue is long-polled.
+    """
+
+    name = "priority"
+
+    def plan(self) -> Iterator[Tuple[SqsQueue, int]]:
+        ordered = sorted(self.queues, key=lambda q: -self.weights[q])
+        for queue in ordered:
+            yield queue, 0
+        yield ordered[0], ordered[0].wait_time_seconds
+
+
+class WeightedFairPolicy(QueuePolicy):
+    """
+    Share iterations between queues in proportion to their weights (smooth weighted round-robin),
+    falling through to the other queues when the selected one is empty.
+    Like StrictPriorityPolicy, uses short polls and long-polls the heaviest queue last.
+    """
+
+    name = "weighted"
+
+    def __init__(self, queues: List[SqsQueue], **kwargs):
+        super().__init__(queues, **kwargs)
+        self._current_weights = {q: 0 for q in self.queues}
+        self._heaviest = max(self.queues, key=lambda q: self.weights[q])
+
+    def plan(self) -> Iterator[Tuple[SqsQueue, int]]:
+        total = sum(self.weights.values())
+        for queue in self.queues:
+            self._current_weights[queue] += self.weights[queue]
+        ordered = sorted(self.queues, key=lambda q: -self._current_weights[q])
+        self._current_weights[ordered[0]] -= total
+
+        for queue in ordered:
+            yield queue, 0
+        yield self._heaviest, self._heaviest.wait_time_seconds
+
+
+class EmptyBackoffPolicy(RoundRobinPolicy):
+    """
+    Poll queues in turn, but skip queues which were empty the last few times they were polled.
+    A queue that was empty `n` times in a row is skipped for `backoff_base * 2 ** (n - 1)` seconds,
+    at most `backoff_max` seconds. If all queues are backing off, the one which is due first is polled.
+    """
+
+    name = "backoff"
+
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
+
+    def __init__(self, queues: List[SqsQueue], **kwargs):
+        super().__init__(queues, **kwargs)
+        self._num_empty: Dict[SqsQueue, int] = {q: 0 for q in self.queues}
+        self._skip_until: Dict[SqsQueue, float] = {q: 0 for q in self.queues}
+
+    def plan(self) -> Iterator[Tuple[SqsQueue, int]]:
+        now = time.time()
+        polled_any = False
+        for queue, wait_time_seconds in super().plan():
+            if self._skip_until[queue] <= now:
+                polled_any = True
+                yield queue, wait_time_seconds
+        if not polled_any:
+            queue = min(self.queues, key=lambda q: self._skip_until[q])
+            yield queue, queue.wait_time_seconds
+
+    def report(self, queue: SqsQueue, received: bool):
+        if received:
+            self._num_empty[queue] = 0
+            self._skip_until[queue] = 0
+        else:
+            self._num_empty[queue] += 1
+            backoff = min(self.backoff_max, self.backoff_base * 2 ** (self._num_empty[queue] - 1))
+            self._skip_until[queue] = time.time() + backoff
+
+
+_policies = {
+    policy_cls.name: policy_cls
+    for policy_cls in (RoundRobinPolicy, StrictPriorityPolicy, WeightedFairPolicy, EmptyBackoffPolicy)
+}
+
+
+def create_queue_policy(
+    policy: Union[str, QueuePolicy],
+    queues: List[SqsQueue],
+    *,
+    weights: Dict[str, int] = None,
+) -> QueuePolicy:
+    if isinstance(policy, QueuePolicy):
+        return policy
+    return _policies[policy](queues, weights=weights)
+
+
+def list_queue_policies() -> List[str]:
+    return list(_policies)
+
+
+def parse_queue_url_arg(value: str) -> Tuple[str, int]:
+    """
+    Parse the value of --queue-url, which is a queue URL optionally followed by ":<weight>".
+    """
+    url, sep, weight = value.rpartition(":")
+    if sep and weight.isdigit():
+        return url, int(weight)
+    return value, None
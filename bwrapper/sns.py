@@ -1,8 +1,18 @@
-import json
 from typing import Any, Dict, Union
 
+from bwrapper.json_utils import to_json
+
 
 class SnsNotification:
+    __slots__ = (
+        "_message",
+        "topic_arn",
+        "target_arn",
+        "phone_number",
+        "subject",
+        "attributes",
+    )
+
     def __init__(
         self,
         *,
@@ -33,7 +43,7 @@ class SnsNotification:
 
         is_json = isinstance(self._message, dict)
         dct = {
-            "Message": json.dumps(self._message, sort_keys=True) if is_json else self._message,
+            "Message": to_json(self._message, sort_keys=True) if is_json else self._message,
         }
         if is_json:
             dct["MessageStructure"] = "json"
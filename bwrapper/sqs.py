@@ -1,15 +1,84 @@
-import copy
-import json
+import dataclasses
+import functools
 import logging
-from typing import Any, Dict, Generator, Union
-
-from bwrapper.boto import BotoMixin
+import re
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple, Union
+
+from bwrapper.blobstore import BlobStore
+from bwrapper.boto import Boto, BotoMixin
+from bwrapper.compression import ENCODING_ATTRIBUTE, compress_body, decompress_body, get_compressor
+from bwrapper.json_utils import from_json, to_json
 from bwrapper.log import LogMixin
 
 log = logging.getLogger(__name__)
 
+# Name of the message attribute which holds the blob store key of an offloaded message body
+CLAIM_CHECK_ATTRIBUTE = "bwrapper.claim-check"
+
+
+class _NotLoaded:
+    """
+    Marks message contents which haven't been extracted from the raw message yet.
+    Pickles by reference so that it survives messages being passed to worker processes.
+    """
+
+    def __repr__(self):
+        return "<not loaded>"
+
+    def __reduce__(self):
+        return "_NOT_LOADED"
+
+
+_NOT_LOADED = _NotLoaded()
+
+# Matches https://sqs.eu-west-1.amazonaws.com/123456789012/queue-name
+# and the legacy https://eu-west-1.queue.amazonaws.com/123456789012/queue-name
+_QUEUE_URL_RE = re.compile(
+    r"^https?://(?:sqs\.(?P<region>[a-z0-9-]+)|(?P<legacy_region>[a-z0-9-]+)\.queue)"
+    r"\.amazonaws\.com(?:\.cn)?/(?P<account_id>\d+)/"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_queue_url(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (region_name, account_id) of the queue, or (None, None) for URLs not in the AWS format.
+    """
+    match = _QUEUE_URL_RE.match(url)
+    if not match:
+        return None, None
+    return match.group("region") or match.group("legacy_region"), match.group("account_id")
+
+
+# Limits imposed by SQS on a single SendMessageBatch call
+MAX_BATCH_SIZE = 10
+MAX_BATCH_PAYLOAD_SIZE = 256 * 1024
+
+# System attributes requested with every ReceiveMessage call
+RECEIVED_SYSTEM_ATTRIBUTES = [
+    "MessageGroupId",
+    "ApproximateReceiveCount",
+    "SentTimestamp",
+]
+
 
 class SqsMessage:
+    __slots__ = (
+        "_queue",
+        "_queue_url",
+        "_body",
+        "delay_seconds",
+        "_attributes",
+        "system_attributes",
+        "deduplication_id",
+        "group_id",
+        "receipt_handle",
+        "raw",
+        "blob_store",
+        "owns_claim_check",
+    )
+
     def __init__(
         self,
         *,
@@ -25,9 +94,9 @@ class SqsMessage:
     ):
         self._queue = queue
         self._queue_url = queue_url
-        self.body = body
+        self._body = body
         self.delay_seconds = delay_seconds
-        self.attributes = attributes
+        self._attributes = attributes
         self.system_attributes = system_attributes
         self.deduplication_id = deduplication_id
         self.group_id = group_id
@@ -35,9 +104,118 @@ class SqsMessage:
 
         self.raw: Dict = None
 
+        # Store from which the body is fetched if it has been offloaded by the sender
+        self.blob_store: BlobStore = None
+
+        # Whether the offloaded body is deleted together with the message.
+        # Cleared when the message is forwarded, because the forwarded message refers to the same body.
+        self.owns_claim_check = True
+
     def __repr__(self):
         return f"<{self.__class__.__name__} {self.raw or '?'}>"
 
+    @property
+    def body(self) -> Union[str, Dict]:
+        """
+        Message body, decoded from JSON if possible.
+        For received messages, decoding happens on first access.
+        """
+        if self._body is _NOT_LOADED:
+            raw_body = self.raw.get("Body")
+            claim_check_key = self.claim_check_key
+            if claim_check_key:
+                if self.blob_store is None:
+                    raise RuntimeError(f"{self} body is in a blob store, but the message has no blob_store set")
+                raw_body = self.blob_store.read_text(claim_check_key)
+            encoding = self.raw.get("MessageAttributes", {}).get(ENCODING_ATTRIBUTE)
+            if encoding:
+                raw_body = decompress_body(raw_body, encoding["StringValue"])
+            try:
+                self._body = from_json(raw_body)
+            except ValueError:
+                self._body = raw_body
+        return self._body
+
+    @body.setter
+    def body(self, value: Union[str, Dict]):
+        self._body = value
+
+    @property
+    def attributes(self) -> Dict:
+        """
+        Message attributes.
+        For received messages, these are extracted from the raw message on first access.
+        """
+        if self._attributes is _NOT_LOADED:
+            attributes = None
+            raw_attributes = self.raw.get("MessageAttributes", None)
+            if raw_attributes:
+                attributes = {}
+                for k, v_def in raw_attributes.items():
+                    if k in (ENCODING_ATTRIBUTE, CLAIM_CHECK_ATTRIBUTE):
+                        continue
+                    attributes[k] = v_def["StringValue"]  # Don't do any type conversions, it's not our job
+            self._attributes = attributes or None
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value: Dict):
+        self._attributes = value
+
+    @property
+    def message_id(self) -> str:
+        """
+        ID assigned by SQS, None for messages which haven't been received.
+        """
+        if self.raw:
+            return self.raw.get("MessageId")
+        return None
+
+    @property
+    def receive_count(self) -> int:
+        """
+        Approximate number of times the message has been received, including this time.
+        None for messages which haven't been received.
+        """
+        if self.raw:
+            receive_count = self.raw.get("Attributes", {}).get("ApproximateReceiveCount")
+            if receive_count is not None:
+                return int(receive_count)
+        return None
+
+    @property
+    def sent_timestamp(self) -> float:
+        """
+        When the message was sent, as seconds since the epoch.
+        None for messages which haven't been received.
+        """
+        if self.raw:
+            sent_timestamp = self.raw.get("Attributes", {}).get("SentTimestamp")
+            if sent_timestamp is not None:
+                return int(sent_timestamp) / 1000.0
+        return None
+
+    @property
+    def age(self) -> float:
+        """
+        Seconds since the message was sent, None if not known.
+        """
+        sent_timestamp = self.sent_timestamp
+        if sent_timestamp is None:
+            return None
+        return time.time() - sent_timestamp
+
+    @property
+    def claim_check_key(self) -> str:
+        """
+        Blob store key of the message body if it has been offloaded by the sender, None otherwise.
+        """
+        if self.raw:
+            claim_check = self.raw.get("MessageAttributes", {}).get(CLAIM_CHECK_ATTRIBUTE)
+            if claim_check:
+                return claim_check["StringValue"]
+        return None
+
     @property
     def queue(self) -> "SqsQueue":
         if self._queue is None and self._queue_url:
@@ -62,7 +240,10 @@ class SqsMessage:
         system_attributes = overrides.pop("system_attributes", None) or self.system_attributes
 
         dct["QueueUrl"] = self.queue_url
-        dct["MessageBody"] = self.body or "{}"
+        body = self.body
+        if isinstance(body, (dict, list)):
+            body = to_json(body)
+        dct["MessageBody"] = body or "{}"
         if self.delay_seconds is not None:
             dct["DelaySeconds"] = self.delay_seconds
         if attributes:
@@ -93,41 +274,52 @@ class SqsMessage:
 
     @classmethod
     def from_sqs_dict(cls, dct: Dict, *, queue: "SqsQueue" = None) -> "SqsMessage":
-
-        attributes = None
-        raw_attributes = dct.get("MessageAttributes", None)
-        if raw_attributes:
-            attributes = {}
-            for k, v_def in raw_attributes.items():
-                attributes[k] = v_def["StringValue"]  # Don't do any type conversions, it's not our job
-
-        raw_body = dct.get("Body")
-        try:
-            body = json.loads(raw_body)
-        except json.JSONDecodeError:
-            body = raw_body
-
+        """
+        Body and attributes are not decoded until they are accessed.
+        The raw message is kept as is, not copied, so it must not be modified afterwards.
+        """
         instance = cls(
             queue=queue,
-            body=body,
-            attributes=attributes,
+            body=_NOT_LOADED,
+            attributes=_NOT_LOADED,
             receipt_handle=dct.get("ReceiptHandle"),
+            group_id=dct.get("Attributes", {}).get("MessageGroupId"),
         )
-        instance.raw = copy.deepcopy(dct)
+        instance.raw = dct
+        if queue is not None:
+            instance.blob_store = queue.claim_check_store
         return instance
 
     def copy(self) -> "SqsMessage":
+        """
+        Create a copy of a received message without a queue.
+        The copy shares the raw message and whatever has been decoded from it so far.
+        """
         assert self.raw
-        return self.__class__.from_sqs_dict(self.raw)
+        instance = self.__class__.from_sqs_dict(self.raw)
+        instance._body = self._body
+        instance._attributes = self._attributes
+        instance.blob_store = self.blob_store
+        instance.owns_claim_check = self.owns_claim_check
+        return instance
 
     def hold(self, timeout: int):
-        self.queue.hold_message(self, timeout=timeout)
+        if self.queue.ack_buffer is not None:
+            self.queue.ack_buffer.change_visibility_timeout(self, timeout=timeout)
+        else:
+            self.queue.hold_message(self, timeout=timeout)
 
     def delete(self):
-        self.queue.delete_message(self)
+        if self.queue.ack_buffer is not None:
+            self.queue.ack_buffer.delete(self)
+        else:
+            self.queue.delete_message(self)
 
     def release(self):
-        self.queue.release_message(self)
+        if self.queue.ack_buffer is not None:
+            self.queue.ack_buffer.change_visibility_timeout(self, timeout=0)
+        else:
+            self.queue.release_message(self)
 
     @property
     def is_sns_notification(self):
@@ -139,25 +331,328 @@ class SqsMessage:
         return SnsNotification.from_sns_via_sqs_dict(self.body)
 
 
+@dataclasses.dataclass
+class SqsSendResult:
+    """
+    Outcome of sending a single message as part of SqsQueue.send_messages()
+    """
+    message: SqsMessage
+    message_id: str = None
+    error_code: str = None
+    error_message: str = None
+    sender_fault: bool = None
+
+    # Set if the message couldn't be encoded or its batch couldn't be sent at all
+    exception: Exception = None
+
+    @property
+    def ok(self) -> bool:
+        return self.message_id is not None
+
+
+def _entry_payload_size(entry: Dict) -> int:
+    """
+    Size of a message entry as counted by SQS towards the payload limit:
+    the body plus names, types and values of all message attributes.
+    """
+    size = len(entry["MessageBody"].encode("utf-8"))
+    for name, value in entry.get("MessageAttributes", {}).items():
+        size += len(name.encode("utf-8"))
+        size += len(value["DataType"].encode("utf-8"))
+        if "StringValue" in value:
+            size += len(value["StringValue"].encode("utf-8"))
+        if "BinaryValue" in value:
+            size += len(value["BinaryValue"])
+    return size
+
+
+def _add_failed_group(failed_groups: Dict[str, int], group_id: str, index: int):
+    if group_id is not None:
+        failed_groups[group_id] = min(index, failed_groups.get(group_id, index))
+
+
 class SqsQueue(LogMixin, BotoMixin):
 
-    def __init__(self, url):
+    def __init__(
+        self,
+        url,
+        *,
+        wait_time_seconds: int = 20,
+        compression: str = None,
+        compression_threshold: int = 8 * 1024,
+        claim_check_store: BlobStore = None,
+        claim_check_threshold: int = 240 * 1024,
+    ):
         self.url = url
 
+        # How long a ReceiveMessage call waits for messages to arrive (long polling), at most 20 seconds.
+        self.wait_time_seconds = wait_time_seconds
+
+        # Name of the compressor ("zlib", "zstd", "lz4" or "auto") used for bodies of sent messages
+        # which are longer than `compression_threshold` bytes. Received messages are always decompressed.
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+
+        # If set, bodies of sent messages which are longer than `claim_check_threshold` bytes
+        # (after compression) are written to the store and only their key is sent through SQS.
+        # Bodies of received messages are fetched from the store when first accessed.
+        self.claim_check_store = claim_check_store
+        self.claim_check_threshold = claim_check_threshold
+
+        # If set to an instance of bwrapper.ack.SqsAckBuffer, SqsMessage.delete(), hold() and release()
+        # are collected and sent in batches instead of one API call each.
+        self.ack_buffer = None
+
+        self._visibility_timeout: int = None
+
+    @property
+    def sqs(self):
+        """
+        SQS client for the region of the queue, assuming the role registered for the account
+        of the queue (see ClientRegistry.register_account_role) if any.
+        """
+        region_name, account_id = parse_queue_url(self.url)
+        if region_name is None:
+            return Boto.sqs
+        return Boto.registry.get(
+            "client",
+            "sqs",
+            region_name=region_name,
+            role_arn=Boto.registry.account_roles.get(account_id),
+        )
+
     @property
     def is_fifo(self):
         return self.url.endswith(".fifo")
 
+    @property
+    def visibility_timeout(self) -> int:
+        """
+        The default visibility timeout of the queue, in seconds.
+        Fetched once and cached.
+        """
+        if self._visibility_timeout is None:
+            resp = self.sqs.get_queue_attributes(QueueUrl=self.url, AttributeNames=["VisibilityTimeout"])
+            self._visibility_timeout = int(resp["Attributes"]["VisibilityTimeout"])
+        return self._visibility_timeout
+
     def send_message(self, message: SqsMessage):
         self.log.debug(f"Sending {message} to {self.url}")
         try:
-            self.sqs.send_message(**message.to_sqs_dict(QueueUrl=self.url))
+            self.sqs.send_message(**self._to_sqs_dict(message))
         except Exception:
             self.log.warning(f"Sending message {message} failed:")
             raise
         else:
             self.log.debug("Message sent")
 
+    def send_messages(self, messages: Iterable[SqsMessage], max_attempts: int = 3) -> List[SqsSendResult]:
+        """
+        Send messages using as few SendMessageBatch calls as possible.
+        Entries that fail for reasons other than a sender fault are retried up to `max_attempts` times.
+        On FIFO queues, a failed entry isn't retried once a later message of its group has been sent,
+        and once a message can't be sent, the later messages of its group aren't sent either.
+        Returns one SqsSendResult per message, in the order the messages were passed.
+
+        Never raises because of a single message or batch, so that the caller always learns
+        which messages have been sent: messages that couldn't be encoded, are too large
+        or whose SendMessageBatch call raised have the exception set on their results.
+        """
+        return self._send_batches(messages, self._to_sqs_dict, max_attempts=max_attempts)
+
+    def forward_messages(self, messages: Iterable[SqsMessage], max_attempts: int = 3) -> List[SqsSendResult]:
+        """
+        Send received messages to this queue as they were received: the raw body and
+        message attributes are passed on unchanged, so compressed and offloaded bodies stay as they are.
+        On a FIFO queue, the message keeps its group (messages without one get a group of their own)
+        and its message ID is used as the deduplication ID.
+
+        The offloaded body of a forwarded message belongs to the new message from then on,
+        it isn't deleted when the original message is.
+        Returns one SqsSendResult per message, like send_messages().
+        """
+        results = self._send_batches(messages, self._to_forwarded_entry, max_attempts=max_attempts)
+        for result in results:
+            if result.ok:
+                result.message.owns_claim_check = False
+        return results
+
+    def _to_forwarded_entry(self, message: SqsMessage) -> Dict:
+        if not message.raw:
+            raise ValueError(f"Only received messages can be forwarded, not {message}")
+        dct = {"MessageBody": message.raw["Body"]}
+        raw_attributes = message.raw.get("MessageAttributes")
+        if raw_attributes:
+            dct["MessageAttributes"] = {
+                k: {vk: vv for vk, vv in v_def.items() if vk in ("DataType", "StringValue", "BinaryValue")}
+                for k, v_def in raw_attributes.items()
+            }
+        if self.is_fifo:
+            dct["MessageGroupId"] = message.group_id or message.message_id
+            dct["MessageDeduplicationId"] = message.message_id
+        return dct
+
+    def _send_batches(
+        self,
+        messages: Iterable[SqsMessage],
+        to_entry: Callable[[SqsMessage], Dict],
+        max_attempts: int,
+    ) -> List[SqsSendResult]:
+        results = []
+
+        # On FIFO queues, the position of the first message of each group that couldn't be sent.
+        # Later messages of the group aren't sent (or retried) after it, so that they can't overtake it.
+        failed_groups: Dict[str, int] = {}
+        num_checked = 0
+
+        for batch in self._iter_batches(messages, to_entry, results):
+            if self.is_fifo:
+                for index in range(num_checked, len(results)):
+                    if results[index].exception is not None:
+                        _add_failed_group(failed_groups, results[index].message.group_id, index)
+                num_checked = len(results)
+
+            pending = {str(i): item for i, item in enumerate(batch)}
+            attempt = 0
+            try:
+                while attempt < max_attempts:
+                    if self.is_fifo:
+                        self._skip_overtaking_entries(pending, failed_groups)
+                    if not pending:
+                        break
+                    attempt += 1
+                    self.log.debug(f"Sending batch of {len(pending)} messages to {self.url} (attempt {attempt})")
+                    resp = self.sqs.send_message_batch(
+                        QueueUrl=self.url,
+                        Entries=[dict(entry, Id=entry_id) for entry_id, (_, _, entry) in pending.items()],
+                    )
+                    for success in resp.get("Successful", ()):
+                        _, result, _ = pending.pop(success["Id"])
+                        result.message_id = success["MessageId"]
+                        result.error_code = result.error_message = result.sender_fault = None
+                    for failure in resp.get("Failed", ()):
+                        index, result, entry = pending[failure["Id"]]
+                        result.error_code = failure.get("Code")
+                        result.error_message = failure.get("Message")
+                        result.sender_fault = failure.get("SenderFault", False)
+                        if result.sender_fault:
+                            # Retrying won't help
+                            del pending[failure["Id"]]
+                            if self.is_fifo:
+                                _add_failed_group(failed_groups, entry.get("MessageGroupId"), index)
+                    if self.is_fifo:
+                        self._stop_retrying_overtaken_entries(pending, batch, failed_groups)
+            except Exception as e:
+                self.log.warning(f"Sending batch of {len(pending)} messages to {self.url} failed: {e}")
+                for _, result, _ in pending.values():
+                    result.exception = e
+            else:
+                for _, result, _ in pending.values():
+                    self.log.warning(
+                        f"Sending message {result.message} failed: {result.error_code} {result.error_message}"
+                    )
+
+            if self.is_fifo:
+                for index, result, entry in batch:
+                    if not result.ok:
+                        _add_failed_group(failed_groups, entry.get("MessageGroupId"), index)
+
+        return results
+
+    def _skip_overtaking_entries(self, pending: Dict[str, Tuple], failed_groups: Dict[str, int]):
+        for entry_id, (index, result, entry) in list(pending.items()):
+            group_id = entry.get("MessageGroupId")
+            if failed_groups.get(group_id, index) < index:
+                self.log.warning(f"Not sending message {result.message}, an earlier message of its group failed")
+                result.exception = RuntimeError(f"An earlier message of group {group_id} couldn't be sent")
+                del pending[entry_id]
+
+    def _stop_retrying_overtaken_entries(self, pending: Dict[str, Tuple], batch: List[Tuple], failed_groups: Dict):
+        """
+        A failed entry can't be retried without breaking the order of its group
+        once a later entry of the group has been sent.
+        """
+        last_sent = {}
+        for index, result, entry in batch:
+            if result.ok:
+                last_sent[entry.get("MessageGroupId")] = index
+        for entry_id, (index, result, entry) in list(pending.items()):
+            group_id = entry.get("MessageGroupId")
+            if last_sent.get(group_id, index) > index:
+                self.log.warning(f"Not retrying message {result.message}, a later message of its group has been sent")
+                del pending[entry_id]
+                _add_failed_group(failed_groups, group_id, index)
+
+    def _to_sqs_dict(self, message: SqsMessage) -> Dict:
+        dct = message.to_sqs_dict(QueueUrl=self.url)
+        if self.compression:
+            self._compress(dct)
+        if self.claim_check_store is not None:
+            self._offload(dct)
+        return dct
+
+    def _compress(self, dct: Dict):
+        body = dct["MessageBody"]
+        if len(body.encode("utf-8")) <= self.compression_threshold:
+            return
+        compressed_body, encoding = compress_body(body, get_compressor(self.compression))
+        if len(compressed_body) >= len(body):
+            return
+        dct["MessageBody"] = compressed_body
+        dct["MessageAttributes"] = dict(
+            dct.get("MessageAttributes", {}),
+            **{ENCODING_ATTRIBUTE: {"DataType": "String", "StringValue": encoding}},
+        )
+
+    def _offload(self, dct: Dict):
+        body = dct["MessageBody"]
+        if len(body.encode("utf-8")) <= self.claim_check_threshold:
+            return
+        key = self.claim_check_store.new_key()
+        self.claim_check_store.write_text(key, body)
+        self.log.debug(f"Offloaded message body of {len(body)} characters to {key}")
+        dct["MessageBody"] = key
+        dct["MessageAttributes"] = dict(
+            dct.get("MessageAttributes", {}),
+            **{CLAIM_CHECK_ATTRIBUTE: {"DataType": "String", "StringValue": key}},
+        )
+
+    def _iter_batches(
+        self,
+        messages: Iterable[SqsMessage],
+        to_entry: Callable[[SqsMessage], Dict],
+        results: List[SqsSendResult],
+    ):
+        """
+        Group messages in lists of (index, result, entry) tuples that fit in a single SendMessageBatch call,
+        where index is the position of the message in `results`.
+        Appends a result for every message to `results`, setting the exception of those
+        which can't be sent because they can't be encoded or are too large.
+        """
+        batch = []
+        batch_size = 0
+        for message in messages:
+            result = SqsSendResult(message=message)
+            results.append(result)
+            try:
+                entry = to_entry(message)
+                entry.pop("QueueUrl", None)
+                entry_size = _entry_payload_size(entry)
+                if entry_size > MAX_BATCH_PAYLOAD_SIZE:
+                    raise ValueError(f"Message of {entry_size} bytes exceeds the limit of {MAX_BATCH_PAYLOAD_SIZE}")
+            except Exception as e:
+                self.log.warning(f"Can't send message {message}: {e}")
+                result.exception = e
+                continue
+            if batch and (len(batch) >= MAX_BATCH_SIZE or batch_size + entry_size > MAX_BATCH_PAYLOAD_SIZE):
+                yield batch
+                batch = []
+                batch_size = 0
+            batch.append((len(results) - 1, result, entry))
+            batch_size += entry_size
+        if batch:
+            yield batch
+
     def receive_message(self, delete=False) -> SqsMessage:
         """
         Returns None if no messages were seen.
@@ -169,17 +664,22 @@ class SqsQueue(LogMixin, BotoMixin):
         self,
         delete=False,
         max_num_messages=10,
+        wait_time_seconds: int = None,
     ) -> Generator[SqsMessage, None, None]:
         """
         Receive multiple messages and yield them as instances of SqsMessage class.
+        Unless `wait_time_seconds` is passed, waits for as long as configured for the queue.
         """
+        if wait_time_seconds is None:
+            wait_time_seconds = self.wait_time_seconds
         resp = self.sqs.receive_message(
             QueueUrl=self.url,
             MaxNumberOfMessages=max_num_messages,
             MessageAttributeNames=[
                 "All",
             ],
-            WaitTimeSeconds=20,
+            AttributeNames=RECEIVED_SYSTEM_ATTRIBUTES,
+            WaitTimeSeconds=wait_time_seconds,
         )
 
         if "Messages" not in resp:
@@ -189,6 +689,9 @@ class SqsQueue(LogMixin, BotoMixin):
         for raw_message in resp["Messages"]:
             message = SqsMessage.from_sqs_dict(raw_message, queue=self)
             if delete:
+                if message.claim_check_key:
+                    # Deleting the message deletes the offloaded body, so it must be loaded first
+                    message.body
                 self.delete_message(message)
             yield message
 
@@ -197,6 +700,7 @@ class SqsQueue(LogMixin, BotoMixin):
             QueueUrl=self.url,
             ReceiptHandle=message.receipt_handle,
         )
+        self._delete_claim_checked_body(message)
 
     def change_visibility_timeout(self, *, message: "SqsMessage", timeout: int):
         self.sqs.change_message_visibility(
@@ -205,6 +709,82 @@ class SqsQueue(LogMixin, BotoMixin):
             VisibilityTimeout=int(round(timeout)),
         )
 
+    def delete_messages(self, messages: Iterable["SqsMessage"], max_attempts: int = 3) -> List["SqsMessage"]:
+        """
+        Delete messages using DeleteMessageBatch calls.
+        Returns the messages that could not be deleted.
+        """
+        messages = list(messages)
+        failed = self._call_batched(
+            self.sqs.delete_message_batch,
+            ((message, {"ReceiptHandle": message.receipt_handle}) for message in messages),
+            max_attempts=max_attempts,
+        )
+        for message in messages:
+            if message not in failed:
+                self._delete_claim_checked_body(message)
+        return failed
+
+    def _delete_claim_checked_body(self, message: "SqsMessage"):
+        key = message.claim_check_key
+        if not key or not message.owns_claim_check:
+            return
+        blob_store = message.blob_store or self.claim_check_store
+        if blob_store is None:
+            self.log.warning(f"Not deleting body {key} of {message}, no blob store configured")
+            return
+        try:
+            blob_store.delete(key)
+        except Exception as e:
+            self.log.warning(f"Deleting body {key} of {message} failed: {e}")
+
+    def change_visibility_timeouts(
+        self,
+        timeouts: Iterable[Tuple["SqsMessage", int]],
+        max_attempts: int = 3,
+    ) -> List["SqsMessage"]:
+        """
+        Change visibility timeouts of messages using ChangeMessageVisibilityBatch calls.
+        Takes (message, timeout) pairs and returns the messages whose visibility could not be changed.
+        """
+        return self._call_batched(
+            self.sqs.change_message_visibility_batch,
+            (
+                (message, {"ReceiptHandle": message.receipt_handle, "VisibilityTimeout": int(round(timeout))})
+                for message, timeout in timeouts
+            ),
+            max_attempts=max_attempts,
+        )
+
+    def _call_batched(
+        self,
+        method: Callable,
+        entries: Iterable[Tuple["SqsMessage", Dict]],
+        max_attempts: int,
+    ) -> List["SqsMessage"]:
+        failed = []
+        entries = list(entries)
+        for i in range(0, len(entries), MAX_BATCH_SIZE):
+            pending = {str(j): entry for j, entry in enumerate(entries[i:i + MAX_BATCH_SIZE])}
+            attempt = 0
+            while pending and attempt < max_attempts:
+                attempt += 1
+                resp = method(
+                    QueueUrl=self.url,
+                    Entries=[dict(entry, Id=entry_id) for entry_id, (_, entry) in pending.items()],
+                )
+                for success in resp.get("Successful", ()):
+                    del pending[success["Id"]]
+                for failure in resp.get("Failed", ()):
+                    if failure.get("SenderFault", False):
+                        message, _ = pending.pop(failure["Id"])
+                        failed.append(message)
+                        self.log.warning(f"{method.__name__} failed for {message}: {failure.get('Code')}")
+            for message, _ in pending.values():
+                self.log.warning(f"{method.__name__} failed for {message} after {max_attempts} attempts")
+                failed.append(message)
+        return failed
+
     def release_message(self, message: "SqsMessage"):
         """
         Make the message immediately visible to other queue consumers.
@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from bwrapper.log import LogMixin
+
+
+class _Watch:
+    def __init__(self, process: multiprocessing.Process):
+        self.process = process
+        self.timed_out = False
+        self.done = threading.Event()
+
+
+class ProcessSupervisor(LogMixin):
+    """
+    Watches any number of child processes from a single background thread which wakes up
+    as soon as one of them exits (through process sentinels) or one of the timeouts,
+    kept in a deadline heap, expires.
+
+    Processes which time out are terminated, and killed if they are still alive
+    `terminate_grace_period` seconds later.
+    """
+
+    terminate_grace_period = 3.0
+    kill_grace_period = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watches: Dict[int, _Watch] = {}
+        self._deadlines: List[Tuple[float, int, _Watch, str]] = []
+        self._sequence = itertools.count()
+        self._wakeup_reader, self._wakeup_writer = multiprocessing.Pipe(duplex=False)
+        self._thread: threading.Thread = None
+
+    def wait(self, process: multiprocessing.Process, timeout: float = None) -> bool:
+        """
+        Block until the started `process` exits, terminating (and if needed, killing) it
+        once `timeout` seconds have passed. Returns True if the process timed out.
+        """
+        watch = _Watch(process)
+        with self._lock:
+            self._watches[process.sentinel] = watch
+            if timeout is not None:
+                self._schedule(time.time() + timeout, watch, "terminate")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+                self._thread.start()
+        self._wakeup_writer.send_bytes(b"")
+        watch.done.wait()
+        return watch.timed_out
+
+    def _schedule(self, deadline: float, watch: _Watch, action: str):
+        heapq.heappush(self._deadlines, (deadline, next(self._sequence), watch, action))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                sentinels = list(self._watches)
+                timeout = None
+                if self._deadlines:
+                    timeout = max(0.0, self._deadlines[0][0] - time.time())
+
+            ready = multiprocessing.connection.wait([self._wakeup_reader] + sentinels, timeout=timeout)
+
+            with self._lock:
+                for obj in ready:
+                    if obj is self._wakeup_reader:
+                        while self._wakeup_reader.poll():
+                            self._wakeup_reader.recv_bytes()
+                    elif obj in self._watches:
+                        self._watches.pop(obj).done.set()
+                self._fire_deadlines()
+
+    def _fire_deadlines(self):
+        """
+        Must be called while holding the lock.
+        """
+        now = time.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, watch, action = heapq.heappop(self._deadlines)
+            if watch.done.is_set():
+                continue
+            process = watch.process
+            if action == "terminate":
+                watch.timed_out = True
+                self.log.debug(f"Process {process.pid} has timed out, terminating it")
+                process.terminate()
+                self._schedule(now + self.terminate_grace_period, watch, "kill")
+            elif action == "kill":
+                self.log.error(f"Terminating process {process.pid} has timed out, killing it now")
+                process.kill()
+                self._schedule(now + self.kill_grace_period, watch, "abandon")
+            else:
+                self.log.error(f"Process {process.pid} is still alive after being killed, giving up on it")
+                self._watches.pop(process.sentinel, None)
+                watch.done.set()
+
+
+_supervisor: ProcessSupervisor = None
+_supervisor_pid: int = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor() -> ProcessSupervisor:
+    """
+    Returns the supervisor shared by all threads of the current process.
+    """
+    global _supervisor, _supervisor_pid
+    with _supervisor_lock:
+        if _supervisor is None or _supervisor_pid != os.getpid():
+            _supervisor = ProcessSupervisor()
+            _supervisor_pid = os.getpid()
+        return _supervisor
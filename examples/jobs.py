@@ -25,8 +25,9 @@ def handle_job(message: SqsMessage, **kwargs):
     """
 
     print("::: H A N D L I N G :::")
-    print(message.__dict__)
+    print(message.attributes, message.body)
 
     if message.is_sns_notification:
         print("\tThis is a SNS notification")
-        print("\t\t", message.extract_sns_notification().__dict__)
+        notification = message.extract_sns_notification()
+        print("\t\t", notification.topic_arn, notification.subject, notification.message)
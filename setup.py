@@ -11,6 +11,12 @@ requirements = [
     "boto3",
 ]
 
+extra_requirements = {
+    "orjson": ["orjson"],
+    "zstd": ["zstandard"],
+    "lz4": ["lz4"],
+}
+
 setup_requirements = ["pytest-runner", ]
 
 test_requirements = ["pytest>=3", ]
@@ -31,6 +37,7 @@ setup(
     ],
     description="It is what it is.",
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     long_description=readme,
     include_package_data=True,
@@ -0,0 +1,72 @@
+import collections
+import itertools
+
+import pytest
+
+from bwrapper.boto import Boto
+from bwrapper.sqs import SqsQueue
+
+
+class FakeSqsClient:
+    """
+    Records calls made to the SQS client.
+    Batch calls fail the entries whose ids are listed in `fail_ids` (until the list is exhausted).
+    """
+
+    def __init__(self):
+        self.calls = collections.defaultdict(list)
+        self.fail_ids = []
+        self.messages = collections.defaultdict(list)
+        self._message_ids = itertools.count(1)
+
+    def _batch_response(self, entries, **success_extras):
+        resp = {"Successful": [], "Failed": []}
+        for entry in entries:
+            if entry["Id"] in self.fail_ids:
+                self.fail_ids.remove(entry["Id"])
+                resp["Failed"].append({"Id": entry["Id"], "Code": "InternalError", "SenderFault": False})
+            else:
+                resp["Successful"].append(dict(Id=entry["Id"], **success_extras))
+        return resp
+
+    def send_message(self, **kwargs):
+        self.calls["send_message"].append(kwargs)
+        return {"MessageId": f"m-{next(self._message_ids)}"}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.calls["send_message_batch"].append(Entries)
+        resp = self._batch_response(Entries)
+        for success in resp["Successful"]:
+            success["MessageId"] = f"m-{next(self._message_ids)}"
+        return resp
+
+    def receive_message(self, QueueUrl, **kwargs):
+        self.calls["receive_message"].append(dict(QueueUrl=QueueUrl, **kwargs))
+        pending = self.messages[QueueUrl]
+        num = kwargs.get("MaxNumberOfMessages", 1)
+        received, self.messages[QueueUrl] = pending[:num], pending[num:]
+        if not received:
+            return {}
+        return {"Messages": received}
+
+    def delete_message(self, **kwargs):
+        self.calls["delete_message"].append(kwargs)
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        self.calls["delete_message_batch"].append(Entries)
+        return self._batch_response(Entries)
+
+    def change_message_visibility(self, **kwargs):
+        self.calls["change_message_visibility"].append(kwargs)
+
+    def change_message_visibility_batch(self, QueueUrl, Entries):
+        self.calls["change_message_visibility_batch"].append(Entries)
+        return self._batch_response(Entries)
+
+
+@pytest.fixture
+def sqs_client(monkeypatch):
+    client = FakeSqsClient()
+    monkeypatch.setattr(Boto, "sqs", client)
+    monkeypatch.setattr(SqsQueue, "sqs", client)
+    return client
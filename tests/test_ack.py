@@ -0,0 +1,88 @@
+import time
+
+from bwrapper.ack import SqsAckBuffer
+from bwrapper.sqs import SqsMessage, SqsQueue
+
+
+def create_message(queue, i):
+    return SqsMessage.from_sqs_dict({"ReceiptHandle": f"rh-{i}", "Body": "{}"}, queue=queue)
+
+
+def test_ack_buffer_flushes_when_full(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    queue.ack_buffer = SqsAckBuffer(queue, max_size=3, max_latency=60)
+
+    messages = [create_message(queue, i) for i in range(3)]
+    for message in messages:
+        message.delete()
+
+    deadline = time.time() + 1
+    while not sqs_client.calls["delete_message_batch"] and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert sqs_client.calls["delete_message_batch"] == [[
+        {"Id": "0", "ReceiptHandle": "rh-0"},
+        {"Id": "1", "ReceiptHandle": "rh-1"},
+        {"Id": "2", "ReceiptHandle": "rh-2"},
+    ]]
+    assert "delete_message" not in sqs_client.calls
+    queue.ack_buffer.close()
+
+
+def test_ack_buffer_flushes_after_max_latency(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    queue.ack_buffer = SqsAckBuffer(queue, max_latency=0.05)
+
+    create_message(queue, 1).hold(timeout=30)
+    time.sleep(0.2)
+    assert sqs_client.calls["change_message_visibility_batch"] == [[
+        {"Id": "0", "ReceiptHandle": "rh-1", "VisibilityTimeout": 30},
+    ]]
+    queue.ack_buffer.close()
+
+
+def test_ack_buffer_delete_supersedes_visibility_change_and_retries(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    queue.ack_buffer = SqsAckBuffer(queue, max_latency=60)
+    sqs_client.fail_ids = ["0"]
+
+    first, second = create_message(queue, 1), create_message(queue, 2)
+    first.hold(timeout=30)
+    second.hold(timeout=30)
+    first.delete()
+    second.release()
+    queue.ack_buffer.close()
+
+    # First attempt fails, the entry is retried
+    assert sqs_client.calls["change_message_visibility_batch"] == [
+        [{"Id": "0", "ReceiptHandle": "rh-2", "VisibilityTimeout": 0}],
+        [{"Id": "0", "ReceiptHandle": "rh-2", "VisibilityTimeout": 0}],
+    ]
+    assert sqs_client.calls["delete_message_batch"] == [
+        [{"Id": "0", "ReceiptHandle": "rh-1"}],
+    ]
+
+
+def test_ack_buffer_keeps_failed_acks_and_flusher_alive(sqs_client, monkeypatch):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    queue.ack_buffer = SqsAckBuffer(queue, max_size=1, max_latency=0.05)
+    delete_message_batch = sqs_client.delete_message_batch
+    num_calls = []
+
+    def fail_first_call(QueueUrl, Entries):
+        num_calls.append(1)
+        if len(num_calls) == 1:
+            raise ConnectionError("Connection reset")
+        return delete_message_batch(QueueUrl, Entries)
+
+    monkeypatch.setattr(sqs_client, "delete_message_batch", fail_first_call)
+    create_message(queue, 0).delete()
+
+    deadline = time.time() + 2
+    while not sqs_client.calls["delete_message_batch"] and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert sqs_client.calls["delete_message_batch"] == [[{"Id": "0", "ReceiptHandle": "rh-0"}]]
+    assert queue.ack_buffer._thread.is_alive()
+    assert len(queue.ack_buffer) == 0
+    queue.ack_buffer.close()
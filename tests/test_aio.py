@@ -0,0 +1,26 @@
+import asyncio
+import json
+
+from bwrapper.aio import AsyncSqsQueue
+from bwrapper.sqs import SqsMessage
+
+QUEUE_URL = "https://sqs.eu-west-1.amazonaws.com/123/queue"
+
+
+def test_async_sqs_queue(sqs_client):
+    sqs_client.messages[QUEUE_URL] = [{"ReceiptHandle": f"rh-{i}", "Body": str(i)} for i in range(3)]
+    queue = AsyncSqsQueue(QUEUE_URL, max_concurrency=2)
+
+    async def consume():
+        await queue.send_message(SqsMessage(body={"a": 1}))
+        received = []
+        async for message in queue:
+            received.append(message.body)
+            await queue.delete_message(message)
+            if len(received) == 3:
+                break
+        return received
+
+    assert asyncio.run(consume()) == [0, 1, 2]
+    assert json.loads(sqs_client.calls["send_message"][0]["MessageBody"]) == {"a": 1}
+    assert [c["ReceiptHandle"] for c in sqs_client.calls["delete_message"]] == ["rh-0", "rh-1", "rh-2"]
@@ -0,0 +1,76 @@
+import datetime as dt
+import threading
+
+from botocore.config import Config
+
+from bwrapper.boto import Boto, ClientRegistry
+from bwrapper.sqs import SqsQueue, parse_queue_url
+
+
+def test_client_registry_caches_clients_per_thread():
+    registry = ClientRegistry()
+    client = registry.get("client", "sqs", region_name="eu-west-1")
+    assert registry.get("client", "sqs", region_name="eu-west-1") is client
+    assert registry.get("client", "sqs", region_name="us-east-1") is not client
+
+    other_thread_clients = []
+    thread = threading.Thread(target=lambda: other_thread_clients.append(
+        registry.get("client", "sqs", region_name="eu-west-1")
+    ))
+    thread.start()
+    thread.join()
+    assert other_thread_clients[0] is not client
+
+
+def test_client_registry_discards_clients_inherited_from_parent_process():
+    registry = ClientRegistry()
+    client = registry.get("client", "sqs", region_name="eu-west-1")
+
+    registry._pid = -1  # As if we were in a forked child
+    assert registry.get("client", "sqs", region_name="eu-west-1") is not client
+
+
+def test_client_registry_applies_connection_settings():
+    registry = ClientRegistry(max_pool_connections=50, tcp_keepalive=True)
+    client = registry.get("client", "sqs", region_name="eu-west-1", config=Config(read_timeout=65))
+    assert client.meta.config.max_pool_connections == 50
+    assert client.meta.config.tcp_keepalive is True
+    assert client.meta.config.read_timeout == 65
+
+
+def test_client_registry_uses_cached_assumed_role_credentials(monkeypatch):
+    registry = ClientRegistry()
+    assumed = []
+
+    def assume_role(role_arn):
+        assumed.append(role_arn)
+        return {
+            "access_key": f"key-{len(assumed)}",
+            "secret_key": "secret",
+            "token": "token",
+            "expiry_time": (dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=1)).isoformat(),
+        }
+
+    monkeypatch.setattr(registry, "_assume_role", assume_role)
+
+    role_arn = "arn:aws:iam::222222222222:role/consumer"
+    eu_client = registry.get("client", "sqs", region_name="eu-west-1", role_arn=role_arn)
+    us_client = registry.get("client", "sqs", region_name="us-east-1", role_arn=role_arn)
+    assert eu_client is not us_client
+    assert assumed == [role_arn]
+    assert eu_client._request_signer._credentials.get_frozen_credentials().access_key == "key-1"
+
+
+def test_sqs_queue_picks_client_by_region_and_account(monkeypatch):
+    monkeypatch.setattr(Boto, "registry", ClientRegistry())
+    requested = []
+    monkeypatch.setattr(Boto.registry, "get", lambda type, service_name, **kwargs: requested.append(kwargs))
+    Boto.registry.register_account_role("222222222222", "arn:aws:iam::222222222222:role/consumer")
+
+    SqsQueue("https://sqs.us-east-2.amazonaws.com/222222222222/queue").sqs
+    SqsQueue("https://eu-west-1.queue.amazonaws.com/111111111111/queue").sqs
+    assert requested == [
+        {"region_name": "us-east-2", "role_arn": "arn:aws:iam::222222222222:role/consumer"},
+        {"region_name": "eu-west-1", "role_arn": None},
+    ]
+    assert parse_queue_url("http://localhost:4566/000000000000/queue") == (None, None)
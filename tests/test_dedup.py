@@ -0,0 +1,46 @@
+import time
+
+from bwrapper.dedup import IdempotencyCache
+from bwrapper.sqs import SqsMessage
+from tests.test_jobsy import QUEUE_URL, RecordingJobsy
+
+
+def create_message(message_id, body="{}"):
+    return SqsMessage.from_sqs_dict({"MessageId": message_id, "ReceiptHandle": f"rh-{message_id}", "Body": body})
+
+
+def test_idempotency_cache_evicts_least_recently_used_and_expired_keys():
+    cache = IdempotencyCache(max_size=2, ttl=0.1)
+    first, second, third = create_message("1"), create_message("2"), create_message("3")
+    cache.add(first)
+    cache.add(second)
+    assert first in cache
+    cache.add(third)
+    assert second not in cache
+    assert first in cache and third in cache
+
+    time.sleep(0.15)
+    assert first not in cache
+    assert len(cache) == 1
+
+
+def test_idempotency_cache_key_func_and_persistence(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    cache = IdempotencyCache(key_func=lambda m: m.body["job"], path=path)
+    cache.add(create_message("1", '{"job": "a"}'))
+    cache.close()
+
+    cache = IdempotencyCache(key_func=lambda m: m.body["job"], path=path)
+    assert create_message("2", '{"job": "a"}') in cache
+    assert create_message("3", '{"job": "b"}') not in cache
+
+
+def test_jobsy_deletes_duplicates_without_handling_them(sqs_client):
+    sqs_client.messages[QUEUE_URL].extend(
+        {"MessageId": "m-1", "ReceiptHandle": f"rh-{i}", "Body": "1"} for i in range(2)
+    )
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=2, dedup=IdempotencyCache())
+    jobsy.run()
+
+    assert jobsy.handled == [1]
+    assert [c["ReceiptHandle"] for c in sqs_client.calls["delete_message"]] == ["rh-0", "rh-1"]
@@ -0,0 +1,27 @@
+import time
+
+from bwrapper.heartbeat import VisibilityHeartbeat
+from bwrapper.sqs import SqsMessage, SqsQueue
+
+
+def test_heartbeat_extends_registered_messages_in_batches(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    first, second = [
+        SqsMessage.from_sqs_dict({"ReceiptHandle": f"rh-{i}", "Body": "{}"}, queue=queue) for i in range(2)
+    ]
+    heartbeat = VisibilityHeartbeat(window=3, interval=0.1)
+    heartbeat.register(first)
+    heartbeat.register(second)
+    time.sleep(0.15)
+    heartbeat.unregister(first)
+    num_batches = len(sqs_client.calls["change_message_visibility_batch"])
+    time.sleep(0.15)
+    heartbeat.close()
+
+    batches = sqs_client.calls["change_message_visibility_batch"]
+    assert batches[0] == [
+        {"Id": "0", "ReceiptHandle": "rh-0", "VisibilityTimeout": 3},
+        {"Id": "1", "ReceiptHandle": "rh-1", "VisibilityTimeout": 3},
+    ]
+    assert len(batches) > num_batches
+    assert all(entry["ReceiptHandle"] == "rh-1" for batch in batches[num_batches:] for entry in batch)
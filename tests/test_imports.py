@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize("module", ["bwrapper.jobsy", "bwrapper.notsy", "bwrapper.aio"])
+def test_importing_does_not_import_boto(module):
+    """
+    boto3 and botocore take most of the startup time of CLIs and job processes,
+    so they must only be imported once a client is needed.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    imported = {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines() if "|" in line}
+    assert module in imported
+    assert not {name for name in imported if name.split(".")[0] in ("boto3", "botocore")}
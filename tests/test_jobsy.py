@@ -0,0 +1,259 @@
+import threading
+import time
+
+from bwrapper.jobsy import Jobsy
+
+QUEUE_URL = "https://sqs.eu-west-1.amazonaws.com/123/queue"
+
+
+class RecordingJobsy(Jobsy):
+    run_loop_sleep = 0
+
+    def __init__(self, *args, job_duration: float = 0, **kwargs):
+        super().__init__(*args, same_process=True, **kwargs)
+        self.job_duration = job_duration
+        self.handled = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def run_job(self, message):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.job_duration)
+        if message.body == "fail":
+            raise RuntimeError("I was asked to fail and so I do")
+        with self._lock:
+            self.handled.append(message.body)
+            self.running -= 1
+
+
+def add_messages(sqs_client, *bodies):
+    sqs_client.messages[QUEUE_URL].extend(
+        {"ReceiptHandle": f"rh-{body}", "Body": str(body)} for body in bodies
+    )
+
+
+def test_jobsy_handles_and_deletes_messages(sqs_client):
+    add_messages(sqs_client, 1, 2, "fail")
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=3)
+    jobsy.run()
+
+    assert jobsy.handled == [1, 2]
+    assert [c["ReceiptHandle"] for c in sqs_client.calls["delete_message"]] == ["rh-1", "rh-2"]
+    assert sqs_client.calls["change_message_visibility"][-1]["ReceiptHandle"] == "rh-fail"
+    assert sqs_client.calls["change_message_visibility"][-1]["VisibilityTimeout"] == 0
+
+
+def test_jobsy_concurrency_never_receives_more_than_free_slots(sqs_client):
+    add_messages(sqs_client, *range(10))
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=10, concurrency=3, job_duration=0.1)
+    jobsy.run()
+
+    assert sorted(jobsy.handled) == list(range(10))
+    assert jobsy.max_running == 3
+    assert all(c["MaxNumberOfMessages"] <= 3 for c in sqs_client.calls["receive_message"])
+    assert len(sqs_client.calls["delete_message"]) == 10
+
+
+def test_jobsy_heartbeat_holds_messages_for_short_window(sqs_client):
+    add_messages(sqs_client, 1)
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=1, heartbeat_window=5, default_timeout=600)
+    jobsy.run()
+
+    assert jobsy.handled == [1]
+    assert sqs_client.calls["change_message_visibility"][0]["VisibilityTimeout"] == 5
+    assert len(sqs_client.calls["delete_message"]) == 1
+
+
+class BatchRecordingJobsy(RecordingJobsy):
+    def run_batch(self, messages):
+        self.handled.append([m.body for m in messages])
+        return [m.body != "fail" for m in messages]
+
+
+def test_jobsy_batch_mode_deletes_successful_and_releases_failed_messages(sqs_client):
+    add_messages(sqs_client, *range(12), "fail")
+    jobsy = BatchRecordingJobsy(QUEUE_URL, max_iterations=1, batch_size=15, batch_wait=0)
+    jobsy.run()
+
+    # One receive only as batch_wait has already expired after it
+    assert jobsy.handled == [list(range(10))]
+
+    jobsy = BatchRecordingJobsy(QUEUE_URL, max_iterations=1, batch_size=15, batch_wait=0.5)
+    jobsy.run()
+    assert jobsy.handled == [[10, 11, "fail"]]
+
+    deleted = [e["ReceiptHandle"] for batch in sqs_client.calls["delete_message_batch"] for e in batch]
+    assert deleted == [f"rh-{i}" for i in range(12)]
+    released = sqs_client.calls["change_message_visibility_batch"][-1]
+    assert [(e["ReceiptHandle"], e["VisibilityTimeout"]) for e in released] == [("rh-fail", 0)]
+
+
+class LargeResultBatchJobsy(Jobsy):
+    run_loop_sleep = 0
+
+    def run_batch(self, messages):
+        # Far more than fits in a pipe buffer
+        return [{"handled": True, "details": "x" * 16 * 1024} for _ in messages]
+
+
+def test_jobsy_batch_in_separate_process_receives_result_larger_than_pipe_buffer(sqs_client):
+    add_messages(sqs_client, *range(10))
+    jobsy = LargeResultBatchJobsy(QUEUE_URL, max_iterations=1, batch_size=10, batch_wait=0, default_timeout=3)
+    started = time.time()
+    jobsy.run()
+
+    assert time.time() - started < 3
+    deleted = [e["ReceiptHandle"] for batch in sqs_client.calls["delete_message_batch"] for e in batch]
+    assert deleted == [f"rh-{i}" for i in range(10)]
+
+
+def add_grouped_messages(sqs_client, *group_bodies):
+    sqs_client.messages[QUEUE_URL].extend(
+        {"ReceiptHandle": f"rh-{group}-{body}", "Body": str(body), "Attributes": {"MessageGroupId": group}}
+        for group, body in group_bodies
+    )
+
+
+def test_jobsy_fifo_groups_run_concurrently_in_order(sqs_client):
+    add_grouped_messages(sqs_client, ("a", 1), ("b", 10), ("a", 2), ("c", 20), ("a", 3), ("b", 11))
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=1, concurrency=6, fifo_groups=True, job_duration=0.05)
+    jobsy.run()
+
+    assert sorted(jobsy.handled) == [1, 2, 3, 10, 11, 20]
+    assert [body for body in jobsy.handled if body < 10] == [1, 2, 3]
+    assert [body for body in jobsy.handled if 10 <= body < 20] == [10, 11]
+    assert jobsy.max_running == 3
+    assert "MessageGroupId" in sqs_client.calls["receive_message"][0]["AttributeNames"]
+
+    # Messages waiting behind others of their group are held, longer the more of them are ahead
+    first_held, second_held = sqs_client.calls["change_message_visibility_batch"][:2]
+    assert [e["ReceiptHandle"] for e in first_held] == ["rh-a-2", "rh-b-11"]
+    assert [e["ReceiptHandle"] for e in second_held] == ["rh-a-3"]
+    assert second_held[0]["VisibilityTimeout"] > first_held[0]["VisibilityTimeout"]
+
+
+def test_jobsy_fifo_groups_release_rest_of_group_after_failure(sqs_client):
+    add_grouped_messages(sqs_client, ("a", "fail"), ("a", 2), ("b", 10))
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=1, concurrency=3, fifo_groups=True)
+    jobsy.run()
+
+    assert jobsy.handled == [10]
+    released = sqs_client.calls["change_message_visibility_batch"][-1]
+    assert [(e["ReceiptHandle"], e["VisibilityTimeout"]) for e in released] == [("rh-a-2", 0)]
+
+
+def test_jobsy_fifo_groups_receive_no_more_than_free_workers(sqs_client):
+    add_grouped_messages(sqs_client, *((group, 1) for group in "abcde"))
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=1, concurrency=2, fifo_groups=True)
+    jobsy.run()
+
+    assert sqs_client.calls["receive_message"][0]["MaxNumberOfMessages"] == 2
+    assert jobsy.handled == [1, 1]
+
+
+def test_jobsy_fifo_groups_stop_heartbeat_of_waiting_messages_without_jobs(sqs_client):
+    now_ms = int(time.time() * 1000)
+    sqs_client.messages[QUEUE_URL].extend(
+        {
+            "ReceiptHandle": f"rh-{age}",
+            "Body": str(age),
+            "Attributes": {"MessageGroupId": "a", "SentTimestamp": str(now_ms - age * 1000)},
+        }
+        for age in (5, 120)
+    )
+    jobsy = RecordingJobsy(
+        QUEUE_URL, max_iterations=1, concurrency=2, fifo_groups=True, job_duration=0.05,
+        heartbeat_window=30, max_message_age=60,
+    )
+    registered, unregistered = [], []
+    register, unregister = jobsy._heartbeat.register, jobsy._heartbeat.unregister
+    jobsy._heartbeat.register = lambda message: registered.append(message) or register(message)
+    jobsy._heartbeat.unregister = lambda message: unregistered.append(message) or unregister(message)
+    jobsy.run()
+
+    # The expired message was held while waiting behind the first one, and shed without a job
+    assert jobsy.handled == [5]
+    assert jobsy.metrics["expired"] == 1
+    assert "rh-120" in [m.receipt_handle for m in registered]
+    assert set(registered) <= set(unregistered)
+
+
+def test_jobsy_delays_retries_and_quarantines_poison_messages(sqs_client):
+    quarantine_url = "https://sqs.eu-west-1.amazonaws.com/123/quarantine"
+    sqs_client.messages[QUEUE_URL].extend(
+        {"ReceiptHandle": f"rh-{i}", "Body": "fail", "Attributes": {"ApproximateReceiveCount": str(i)}}
+        for i in (2, 3, 4)
+    )
+    jobsy = RecordingJobsy(
+        QUEUE_URL, max_iterations=3, max_attempts=3, quarantine_queue=quarantine_url, retry_delay_base=10,
+    )
+    jobsy.run()
+
+    # Second attempt failed, retried after a delay
+    assert sqs_client.calls["change_message_visibility_batch"][-1] == [
+        {"Id": "0", "ReceiptHandle": "rh-2", "VisibilityTimeout": 20},
+    ]
+    # Third attempt failed, and the fourth is not even attempted
+    assert jobsy.running == 2
+    assert [e["MessageBody"] for batch in sqs_client.calls["send_message_batch"] for e in batch] == ["fail", "fail"]
+    assert [e["ReceiptHandle"] for batch in sqs_client.calls["delete_message_batch"] for e in batch] == [
+        "rh-3", "rh-4",
+    ]
+
+
+def test_jobsy_quarantines_messages_unchanged(sqs_client):
+    quarantine_url = "https://sqs.eu-west-1.amazonaws.com/123/quarantine.fifo"
+    sqs_client.messages[QUEUE_URL].extend(
+        {
+            "MessageId": f"id-{i}",
+            "ReceiptHandle": f"rh-{i}",
+            "Body": body,
+            "Attributes": dict({"ApproximateReceiveCount": "4"}, **({"MessageGroupId": "a"} if i else {})),
+        }
+        for i, body in enumerate(["42", '"hello"'])
+    )
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=2, max_attempts=3, quarantine_queue=quarantine_url)
+    jobsy.run()
+
+    assert jobsy.handled == []
+    entries = [e for batch in sqs_client.calls["send_message_batch"] for e in batch]
+    assert [e["MessageBody"] for e in entries] == ["42", '"hello"']
+    assert [(e["MessageGroupId"], e["MessageDeduplicationId"]) for e in entries] == [("id-0", "id-0"), ("a", "id-1")]
+
+
+def test_jobsy_sheds_expired_messages(sqs_client):
+    now_ms = int(time.time() * 1000)
+    sqs_client.messages[QUEUE_URL].extend(
+        {"ReceiptHandle": f"rh-{age}", "Body": str(age), "Attributes": {"SentTimestamp": str(now_ms - age * 1000)}}
+        for age in (120, 5)
+    )
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=2, max_message_age=60)
+    jobsy.run()
+
+    assert jobsy.handled == [5]
+    assert jobsy.metrics["expired"] == 1
+    assert [c["ReceiptHandle"] for c in sqs_client.calls["delete_message_batch"][0]] == ["rh-120"]
+
+
+def test_jobsy_diverts_expired_messages_unchanged(sqs_client):
+    expired_url = "https://sqs.eu-west-1.amazonaws.com/123/expired"
+    sqs_client.messages[QUEUE_URL].append({
+        "ReceiptHandle": "rh-old",
+        "Body": "42",
+        "MessageAttributes": {"type": {"DataType": "String", "StringValue": "a"}},
+        "Attributes": {"SentTimestamp": str(int(time.time() * 1000) - 120 * 1000)},
+    })
+    jobsy = RecordingJobsy(
+        QUEUE_URL, max_iterations=1, max_message_age=60, expired_action="divert", expired_queue=expired_url,
+    )
+    jobsy.run()
+
+    assert jobsy.handled == []
+    assert jobsy.metrics["expired"] == 1
+    [entry] = sqs_client.calls["send_message_batch"][0]
+    assert entry["MessageBody"] == "42"
+    assert entry["MessageAttributes"] == {"type": {"DataType": "String", "StringValue": "a"}}
+    assert [e["ReceiptHandle"] for e in sqs_client.calls["delete_message_batch"][0]] == ["rh-old"]
@@ -0,0 +1,64 @@
+import datetime as dt
+import decimal
+import json
+import math
+import uuid
+
+import pytest
+
+from bwrapper import json_utils
+from bwrapper.json_utils import from_json, to_json
+
+
+@pytest.fixture(params=json_utils.list_codecs())
+def codec(request, monkeypatch):
+    try:
+        codec = json_utils._codecs[request.param]()
+    except ImportError:
+        pytest.skip(f"{request.param} is not installed")
+    monkeypatch.setattr(json_utils, "_codec", codec)
+    return codec
+
+
+def test_codecs_agree_with_json_encoder(codec):
+    obj = {
+        "b": dt.datetime(2020, 2, 14, 16, 29, 27),
+        "a": [decimal.Decimal("1.5"), decimal.Decimal("2")],
+        "c": 2 ** 70 + 1,
+        "d": None,
+    }
+    encoded = to_json(obj, sort_keys=True)
+    assert json.loads(encoded) == json.loads(json.dumps(obj, cls=json_utils.JsonEncoder, sort_keys=True))
+    assert encoded.index('"a"') < encoded.index('"b"')
+    assert from_json(encoded) == {"a": [1.5, 2], "b": "2020-02-14 16:29:27", "c": 2 ** 70 + 1, "d": None}
+
+
+def test_codecs_agree_with_json_encoder_on_non_finite_floats(codec):
+    obj = {"nan": float("nan"), "inf": [float("inf"), float("-inf")], "x": 1.5}
+    encoded = to_json(obj)
+    assert encoded == json.dumps(obj, cls=json_utils.JsonEncoder)
+    decoded = from_json(encoded)
+    assert math.isnan(decoded["nan"])
+    assert decoded["inf"] == [float("inf"), float("-inf")]
+
+
+def test_codecs_reject_unsupported_types(codec):
+    with pytest.raises(TypeError):
+        to_json({"date": dt.date(2020, 2, 14)})
+    with pytest.raises(TypeError):
+        to_json({"id": uuid.uuid4()})
+
+
+def test_codecs_raise_value_error_on_invalid_json(codec):
+    with pytest.raises(ValueError):
+        from_json("This is the plain text body")
+
+
+def test_to_json_falls_back_to_stdlib_for_other_options():
+    assert to_json({"a": decimal.Decimal("2")}, indent=2) == '{\n  "a": 2\n}'
+
+
+def test_codecs_decode_integers_over_64_bits_exactly(codec):
+    assert from_json(str(2 ** 64 + 1)) == 2 ** 64 + 1
+    assert from_json(str(-(2 ** 63) - 1)) == -(2 ** 63) - 1
+    assert from_json('{"id": "1234567890123456789012"}') == {"id": "1234567890123456789012"}
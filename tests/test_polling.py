@@ -0,0 +1,80 @@
+import threading
+import time
+
+from bwrapper.ack import SqsAckBuffer
+from bwrapper.polling import ConcurrentPoller
+from bwrapper.sqs import SqsQueue
+
+
+def test_concurrent_poller_polls_all_queues_at_once(sqs_client):
+    slow_url = "https://sqs.eu-west-1.amazonaws.com/123/slow"
+    fast_url = "https://sqs.eu-west-1.amazonaws.com/123/fast"
+    sqs_client.messages[fast_url] = [{"ReceiptHandle": "rh-1", "Body": "1"}]
+
+    slow_poll_release = threading.Event()
+    receive_message = sqs_client.receive_message
+
+    def blocking_receive_message(QueueUrl, **kwargs):
+        if QueueUrl == slow_url:
+            slow_poll_release.wait(5)
+        return receive_message(QueueUrl, **kwargs)
+
+    sqs_client.receive_message = blocking_receive_message
+
+    poller = ConcurrentPoller([SqsQueue(slow_url), SqsQueue(fast_url, wait_time_seconds=1)], visibility_timeout=30)
+    message = poller.receive_message(timeout=2)
+    assert message.receipt_handle == "rh-1"
+
+    # The still-running poll of the slow queue is reused, not duplicated
+    sqs_client.messages[slow_url] = [{"ReceiptHandle": "rh-2", "Body": "2"}]
+    slow_poll_release.set()
+    message = poller.receive_message(timeout=2)
+    assert message.receipt_handle == "rh-2"
+    assert [c["WaitTimeSeconds"] for c in sqs_client.calls["receive_message"] if c["QueueUrl"] == fast_url][0] == 1
+    poller.close()
+
+
+def test_concurrent_poller_releases_carried_over_messages_about_to_expire(sqs_client):
+    first_url = "https://sqs.eu-west-1.amazonaws.com/123/first"
+    second_url = "https://sqs.eu-west-1.amazonaws.com/123/second"
+    sqs_client.messages[first_url] = [{"ReceiptHandle": "rh-1", "Body": "1"}]
+    sqs_client.messages[second_url] = [{"ReceiptHandle": "rh-2", "Body": "2"}]
+
+    poller = ConcurrentPoller([SqsQueue(first_url), SqsQueue(second_url)], visibility_timeout=1, min_time_left=0.5)
+    first = poller.receive_message(timeout=1)
+    time.sleep(0.1)  # Let the other poll complete as well
+
+    # A long job later, the other message is about to become visible again
+    time.sleep(0.6)
+    assert poller.receive_message(timeout=0) is None
+    released = sqs_client.calls["change_message_visibility"]
+    assert [(c["ReceiptHandle"], c["VisibilityTimeout"]) for c in released] == [
+        ("rh-2" if first.receipt_handle == "rh-1" else "rh-1", 0),
+    ]
+    poller.close()
+
+
+def test_concurrent_poller_releases_messages_received_after_close_without_ack_buffer(sqs_client):
+    url = "https://sqs.eu-west-1.amazonaws.com/123/queue"
+    queue = SqsQueue(url)
+    queue.ack_buffer = SqsAckBuffer(queue)
+    poll_release = threading.Event()
+    receive_message = sqs_client.receive_message
+
+    def blocking_receive_message(**kwargs):
+        poll_release.wait(5)
+        return receive_message(**kwargs)
+
+    sqs_client.receive_message = blocking_receive_message
+    poller = ConcurrentPoller([queue], visibility_timeout=30)
+    assert poller.receive_message(timeout=0.1) is None
+
+    poller.close()
+    queue.ack_buffer.close()
+    sqs_client.messages[url] = [{"ReceiptHandle": "rh-1", "Body": "1"}]
+    poll_release.set()
+    poller._executor.shutdown(wait=True)
+
+    assert sqs_client.calls["change_message_visibility"] == [
+        {"QueueUrl": url, "ReceiptHandle": "rh-1", "VisibilityTimeout": 0},
+    ]
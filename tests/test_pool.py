@@ -0,0 +1,94 @@
+import os
+import time
+
+import pytest
+
+from bwrapper.pool import WorkerPool
+
+_initialized = []
+
+
+def initialize(value):
+    _initialized.append(value)
+
+
+def check_initialized(expected):
+    assert _initialized == [expected]
+
+
+def record_pid(path):
+    with open(path, "a") as f:
+        f.write(f"{os.getpid()}\n")
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+def test_worker_pool_reuses_initialized_workers(tmp_path):
+    pool = WorkerPool(1, initializer=initialize, initargs=("loaded",), max_tasks_per_child=3)
+    path = str(tmp_path / "pids")
+    try:
+        pool.run(check_initialized, ("loaded",))
+        for _ in range(4):
+            pool.run(record_pid, (path,))
+    finally:
+        pool.close()
+
+    with open(path) as f:
+        pids = f.read().split()
+    # First worker ran 1 + 2 tasks, then it was replaced
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+
+
+def test_worker_pool_reports_failures_and_timeouts():
+    pool = WorkerPool(1)
+    try:
+        with pytest.raises(WorkerPool.JobFailed, match="AssertionError"):
+            pool.run(check_initialized, ("not loaded",))
+
+        started = time.time()
+        with pytest.raises(WorkerPool.JobFailed, match="timed out"):
+            pool.run(sleep, (10,), timeout=0.2)
+        assert time.time() - started < 5
+
+        pool.run(sleep, (0,))
+    finally:
+        pool.close()
+
+
+def test_worker_pool_returns_job_results():
+    pool = WorkerPool(1)
+    try:
+        assert pool.run(sum, ([1, 2, 3],)) == 6
+    finally:
+        pool.close()
+
+
+def test_worker_pool_survives_jobs_that_cant_be_pickled():
+    pool = WorkerPool(1)
+    try:
+        with pytest.raises(WorkerPool.JobFailed):
+            pool.run(lambda: None)
+        assert pool.run(sum, ([1, 2],)) == 3
+    finally:
+        pool.close()
+
+
+def test_jobsy_rejects_job_runner_that_cant_be_pickled():
+    from bwrapper.jobsy import Jobsy
+
+    with pytest.raises(ValueError):
+        Jobsy("https://sqs.eu-west-1.amazonaws.com/123/queue", pool_size=1)
+
+
+def test_jobsy_with_router_only_checks_route_handlers():
+    from bwrapper.jobsy import Jobsy
+    from bwrapper.routing import Route, Router
+
+    router = Router({"a": Route(handler_path="tests.test_routing.handle_a")}, attribute="type")
+    jobsy = Jobsy("https://sqs.eu-west-1.amazonaws.com/123/queue", pool_size=1, router=router)
+    jobsy.close()
+
+    with pytest.raises(ValueError):
+        Jobsy("https://sqs.eu-west-1.amazonaws.com/123/queue", pool_size=1, router=Router({"a": Route(lambda m: m)}))
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from bwrapper.ack import SqsAckBuffer
+from bwrapper.prefetch import SqsPrefetcher
+from bwrapper.sqs import SqsQueue
+
+QUEUE_URL = "https://sqs.eu-west-1.amazonaws.com/123/queue"
+
+
+def test_prefetcher_receives_in_batches_of_ten(sqs_client):
+    sqs_client.messages[QUEUE_URL] = [{"ReceiptHandle": f"rh-{i}", "Body": str(i)} for i in range(15)]
+    prefetcher = SqsPrefetcher([SqsQueue(QUEUE_URL)], max_size=20, visibility_timeout=30)
+
+    received = [prefetcher.get(timeout=1).body for _ in range(15)]
+    assert received == list(range(15))
+    assert sqs_client.calls["receive_message"][0]["MaxNumberOfMessages"] == 10
+    prefetcher.close()
+
+
+def test_prefetcher_releases_messages_it_cannot_start_in_time(sqs_client):
+    sqs_client.messages[QUEUE_URL] = [{"ReceiptHandle": "rh-1", "Body": "1"}]
+    prefetcher = SqsPrefetcher([SqsQueue(QUEUE_URL)], visibility_timeout=1, min_time_left=0.9)
+    prefetcher.start()
+
+    time.sleep(0.3)
+    assert prefetcher.get(timeout=0.1) is None
+    assert sqs_client.calls["change_message_visibility"] == [
+        {"QueueUrl": QUEUE_URL, "ReceiptHandle": "rh-1", "VisibilityTimeout": 0},
+    ]
+    prefetcher.close()
+
+
+def test_prefetcher_releases_buffered_messages_on_close(sqs_client):
+    sqs_client.messages[QUEUE_URL] = [{"ReceiptHandle": f"rh-{i}", "Body": str(i)} for i in range(3)]
+    prefetcher = SqsPrefetcher([SqsQueue(QUEUE_URL)], visibility_timeout=30)
+
+    assert prefetcher.get(timeout=1).body == 0
+    prefetcher.close()
+    assert [c["ReceiptHandle"] for c in sqs_client.calls["change_message_visibility"]] == ["rh-1", "rh-2"]
+
+
+def test_prefetcher_releases_messages_received_after_close_without_ack_buffer(sqs_client):
+    queue = SqsQueue(QUEUE_URL)
+    queue.ack_buffer = SqsAckBuffer(queue)
+    poll_release = threading.Event()
+    receive_message = sqs_client.receive_message
+
+    def blocking_receive_message(**kwargs):
+        poll_release.wait(5)
+        return receive_message(**kwargs)
+
+    sqs_client.receive_message = blocking_receive_message
+    prefetcher = SqsPrefetcher([queue], visibility_timeout=30)
+    prefetcher.start()
+    time.sleep(0.1)
+
+    # Shutting down closes the ack buffer while the long poll is still in flight
+    prefetcher.close()
+    queue.ack_buffer.close()
+    sqs_client.messages[QUEUE_URL] = [{"ReceiptHandle": "rh-1", "Body": "1"}]
+    poll_release.set()
+    prefetcher._thread.join(1)
+
+    assert sqs_client.calls["change_message_visibility"] == [
+        {"QueueUrl": QUEUE_URL, "ReceiptHandle": "rh-1", "VisibilityTimeout": 0},
+    ]
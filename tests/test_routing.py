@@ -0,0 +1,90 @@
+import collections
+import json
+import time
+
+from bwrapper import sqs
+from bwrapper.routing import Route, Router
+from bwrapper.sqs import SqsMessage
+from tests.test_jobsy import QUEUE_URL, RecordingJobsy
+
+FORWARD_URL = "https://sqs.eu-west-1.amazonaws.com/123/unmatched"
+TOPIC_ARN = "arn:aws:sns:eu-west-1:123:topic"
+
+handled = []
+
+
+def handle_a(message):
+    handled.append(("a", message.body))
+
+
+def handle_slowly(message):
+    time.sleep(0.2)
+    handled.append(("slow", message.body))
+
+
+def handle_topic(message):
+    handled.append(("topic", message.extract_sns_notification().message))
+
+
+def add_message(sqs_client, body, type_=None):
+    raw = {"ReceiptHandle": f"rh-{body}", "Body": body}
+    if type_:
+        raw["MessageAttributes"] = {"type": {"DataType": "String", "StringValue": type_}}
+    sqs_client.messages[QUEUE_URL].append(raw)
+
+
+def test_router_routes_by_attribute_and_topic_arn(sqs_client):
+    handled.clear()
+    add_message(sqs_client, "1", type_="a")
+    add_message(sqs_client, json.dumps({"Type": "Notification", "TopicArn": TOPIC_ARN, "Message": "2"}))
+
+    router = Router({"a": Route(handle_a), TOPIC_ARN: Route(handle_topic, concurrency=1)}, attribute="type")
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=2, router=router)
+    jobsy.run()
+
+    assert handled == [("a", 1), ("topic", "2")]
+    assert jobsy.handled == []
+    assert len(sqs_client.calls["delete_message"]) == 2
+
+
+def test_router_forwards_unmatched_messages_without_creating_jobs(sqs_client):
+    add_message(sqs_client, "1", type_="b")
+
+    router = Router({"a": Route(handler_path="tests.test_routing.handle_a")}, attribute="type", unmatched=FORWARD_URL)
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=1, router=router)
+    jobsy.run()
+
+    assert jobsy.handled == []
+    # The raw body is forwarded as it was received, not re-encoded from the decoded body
+    [entry] = sqs_client.calls["send_message_batch"][0]
+    assert entry["MessageBody"] == "1"
+    assert entry["MessageAttributes"] == {"type": {"DataType": "String", "StringValue": "b"}}
+    assert sqs_client.calls["delete_message"][0]["ReceiptHandle"] == "rh-1"
+    assert "change_message_visibility" not in sqs_client.calls
+
+
+def test_router_holds_messages_waiting_for_route_slot(sqs_client):
+    handled.clear()
+    add_message(sqs_client, "1", type_="a")
+    add_message(sqs_client, "2", type_="a")
+
+    router = Router({"a": Route(handle_slowly, concurrency=1)}, attribute="type")
+    jobsy = RecordingJobsy(QUEUE_URL, max_iterations=1, concurrency=2, router=router)
+    jobsy.run()
+
+    assert sorted(handled) == [("slow", 1), ("slow", 2)]
+    # The message that had to wait for the slot was held while waiting, and again when its job started
+    holds = collections.Counter(c["ReceiptHandle"] for c in sqs_client.calls["change_message_visibility"])
+    assert sorted(holds.values()) == [1, 2]
+
+
+def test_router_matches_by_attribute_without_decoding_body():
+    router = Router({"a": Route(handle_a)}, attribute="type")
+    message = SqsMessage.from_sqs_dict({
+        "ReceiptHandle": "rh-1",
+        "Body": json.dumps({"Type": "Notification", "TopicArn": TOPIC_ARN}),
+        "MessageAttributes": {"type": {"DataType": "String", "StringValue": "a"}},
+    })
+
+    assert router.match(message) is router.routes["a"]
+    assert message._body is sqs._NOT_LOADED
@@ -1,3 +1,4 @@
+import threading
 import time
 
 from bwrapper.run_loop import RunLoop
@@ -36,3 +37,32 @@ def test_run_loop_respects_timeout():
 
     assert end_time - start_time < 0.05
     assert count > 10
+
+
+def test_adaptive_run_loop_continues_while_busy_and_backs_off_when_idle():
+    run_loop = RunLoop(adaptive=True, idle_sleep_min=0.01, idle_sleep_max=0.04, idle_jitter=0, max_iterations=6)
+    results = [True, True, False, False, False, False]
+    sleeps = []
+
+    def callback():
+        sleeps.append(run_loop.next_sleep())
+        return results[run_loop.current_iteration - 1]
+
+    run_loop.loop_over(callback)
+    assert sleeps == [0, 0, 0, 0.01, 0.02, 0.04]
+
+
+def test_run_loop_stop_interrupts_sleep():
+    run_loop = RunLoop(sleep=10)
+    assert run_loop.should_run()  # Doesn't sleep before the first iteration
+
+    threading.Timer(0.05, run_loop.stop).start()
+    started = time.time()
+    assert not run_loop.should_run()
+    assert time.time() - started < 1
+
+
+def test_adaptive_run_loop_honours_explicit_reports():
+    run_loop = RunLoop(adaptive=True, idle_sleep_min=0.01, idle_jitter=0, max_iterations=2)
+    run_loop.loop_over(lambda: run_loop.report(True))
+    assert run_loop.next_sleep() == 0
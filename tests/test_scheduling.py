@@ -0,0 +1,47 @@
+from bwrapper.scheduling import (
+    EmptyBackoffPolicy, RoundRobinPolicy, StrictPriorityPolicy, WeightedFairPolicy, parse_queue_url_arg,
+)
+from bwrapper.sqs import SqsQueue
+
+INTERACTIVE_URL = "https://sqs.eu-west-1.amazonaws.com/123/interactive"
+BATCH_URL = "https://sqs.eu-west-1.amazonaws.com/123/batch"
+
+
+def create_queues():
+    return SqsQueue(INTERACTIVE_URL), SqsQueue(BATCH_URL)
+
+
+def test_parse_queue_url_arg():
+    assert parse_queue_url_arg(f"{INTERACTIVE_URL}:10") == (INTERACTIVE_URL, 10)
+    assert parse_queue_url_arg(INTERACTIVE_URL) == (INTERACTIVE_URL, None)
+
+
+def test_round_robin_policy():
+    interactive, batch = create_queues()
+    policy = RoundRobinPolicy([interactive, batch])
+    assert list(policy.plan()) == [(interactive, 20), (batch, 20)]
+    assert list(policy.plan()) == [(interactive, 20), (batch, 20)]
+
+
+def test_strict_priority_policy_long_polls_highest_priority_queue_only():
+    interactive, batch = create_queues()
+    policy = StrictPriorityPolicy([batch, interactive], weights={INTERACTIVE_URL: 10})
+    assert list(policy.plan()) == [(interactive, 0), (batch, 0), (interactive, 20)]
+
+
+def test_weighted_fair_policy_shares_first_pick_by_weight():
+    interactive, batch = create_queues()
+    policy = WeightedFairPolicy([interactive, batch], weights={INTERACTIVE_URL: 3, BATCH_URL: 1})
+    first_picks = [next(iter(policy.plan()))[0] for _ in range(8)]
+    assert first_picks.count(interactive) == 6
+    assert first_picks.count(batch) == 2
+
+
+def test_empty_backoff_policy_skips_recently_empty_queues():
+    interactive, batch = create_queues()
+    policy = EmptyBackoffPolicy([interactive, batch])
+    policy.report(batch, received=False)
+    assert list(policy.plan()) == [(interactive, 20)]
+
+    policy.report(interactive, received=False)
+    assert [q for q, _ in policy.plan()] == [batch]  # Due first
@@ -1,7 +1,11 @@
 import json
+import os
+import pickle
 
+from bwrapper.blobstore import LocalBlobStore
+from bwrapper.compression import ENCODING_ATTRIBUTE
 from bwrapper.sns import SnsNotification
-from bwrapper.sqs import SqsMessage
+from bwrapper.sqs import CLAIM_CHECK_ATTRIBUTE, SqsMessage, SqsQueue
 
 
 def test_to_sqs_dict():
@@ -120,3 +124,197 @@ def test_forwarded_sns_notification():
     assert isinstance(notif, SnsNotification)
     assert notif.subject == "Are you listening?"
     assert notif.message == "Some message"
+
+
+def test_send_messages_chunks_into_batches(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    messages = [SqsMessage(body=f"message {i}") for i in range(23)]
+
+    results = queue.send_messages(messages)
+    assert [len(batch) for batch in sqs_client.calls["send_message_batch"]] == [10, 10, 3]
+    assert [r.message for r in results] == messages
+    assert all(r.ok for r in results)
+
+
+def test_send_messages_respects_payload_limit(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    messages = [SqsMessage(body="x" * 100 * 1024) for _ in range(5)]
+
+    queue.send_messages(messages)
+    assert [len(batch) for batch in sqs_client.calls["send_message_batch"]] == [2, 2, 1]
+
+
+def test_send_messages_retries_failed_entries_only(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    messages = [SqsMessage(body=f"message {i}", group_id="g", deduplication_id=str(i)) for i in range(3)]
+    sqs_client.fail_ids = ["1"]
+
+    results = queue.send_messages(messages)
+    first, second = sqs_client.calls["send_message_batch"]
+    assert [e["Id"] for e in first] == ["0", "1", "2"]
+    expected_entry = messages[1].to_sqs_dict()
+    del expected_entry["QueueUrl"]
+    assert second == [dict(expected_entry, Id="1")]
+    assert all(r.ok for r in results)
+
+
+def test_send_messages_keeps_order_of_message_groups_on_fifo_queues(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue.fifo")
+    messages = [SqsMessage(body=f"message {i}", group_id="g", deduplication_id=str(i)) for i in range(3)]
+    sqs_client.fail_ids = ["1"]
+
+    # Retrying the failed message would send it after the next one of its group
+    results = queue.send_messages(messages)
+    assert len(sqs_client.calls["send_message_batch"]) == 1
+    assert [r.ok for r in results] == [True, False, True]
+
+    sqs_client.calls.clear()
+    messages = [SqsMessage(body=f"message {i}", group_id="g" if i % 2 else "h") for i in range(12)]
+    sqs_client.fail_ids = ["9", "9", "9"]
+
+    # Once a message fails for good, the rest of its group isn't sent at all
+    results = queue.send_messages(messages)
+    assert [[e["Id"] for e in batch] for batch in sqs_client.calls["send_message_batch"]] == [
+        [str(i) for i in range(10)], ["9"], ["9"], ["0"],
+    ]
+    assert [r.ok for r in results] == [True] * 9 + [False, True, False]
+    assert isinstance(results[11].exception, RuntimeError)
+
+
+def test_from_sqs_dict_decodes_lazily_and_copy_shares_decoded_body():
+    raw = {
+        "ReceiptHandle": "receipt-handle",
+        "Body": json.dumps({"a": 123}),
+    }
+
+    msg = SqsMessage.from_sqs_dict(raw)
+    assert msg.raw is raw
+    assert msg._body is not msg.body  # Not decoded until first accessed
+
+    msg_copy = msg.copy()
+    assert msg_copy.body is msg.body
+    assert msg_copy.raw is raw
+    assert msg_copy.attributes is None
+
+
+def test_received_message_survives_pickling():
+    msg = SqsMessage.from_sqs_dict({"ReceiptHandle": "receipt-handle", "Body": json.dumps({"a": 123})})
+
+    unpickled = pickle.loads(pickle.dumps(msg.copy()))
+    assert unpickled.body == {"a": 123}
+    assert unpickled.receipt_handle == "receipt-handle"
+    assert not hasattr(unpickled, "__dict__")
+
+
+def test_large_bodies_are_compressed_and_decompressed_transparently(sqs_client):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue", compression="zlib", compression_threshold=100)
+    body = {"items": list(range(1000))}
+
+    queue.send_message(SqsMessage(body=body, attributes={"x": 1}))
+    queue.send_message(SqsMessage(body="short"))
+    compressed, uncompressed = sqs_client.calls["send_message"]
+    assert compressed["MessageAttributes"][ENCODING_ATTRIBUTE] == {"DataType": "String", "StringValue": "zlib+base64"}
+    assert len(compressed["MessageBody"]) < len(json.dumps(body))
+    assert uncompressed["MessageBody"] == "short"
+    assert "MessageAttributes" not in uncompressed
+
+    msg = SqsMessage.from_sqs_dict({
+        "ReceiptHandle": "receipt-handle",
+        "Body": compressed["MessageBody"],
+        "MessageAttributes": compressed["MessageAttributes"],
+    })
+    assert msg.body == body
+    assert msg.attributes == {"x": "1"}
+
+
+def test_oversized_bodies_are_offloaded_to_blob_store(sqs_client, tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path))
+    queue = SqsQueue(
+        "https://sqs.eu-west-1.amazonaws.com/123/queue",
+        claim_check_store=blob_store,
+        claim_check_threshold=1024,
+    )
+    body = {"payload": "x" * 300 * 1024}
+
+    queue.send_message(SqsMessage(body=body))
+    sent, = sqs_client.calls["send_message"]
+    key = sent["MessageAttributes"][CLAIM_CHECK_ATTRIBUTE]["StringValue"]
+    assert sent["MessageBody"] == key
+    assert os.listdir(tmp_path) == [key]
+
+    msg = SqsMessage.from_sqs_dict({
+        "ReceiptHandle": "receipt-handle",
+        "Body": sent["MessageBody"],
+        "MessageAttributes": sent["MessageAttributes"],
+    }, queue=queue)
+    job_msg = pickle.loads(pickle.dumps(msg.copy()))
+    assert job_msg.body == body
+    assert job_msg.attributes is None
+
+    msg.delete()
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_and_delete_loads_offloaded_body_before_deleting_it(sqs_client, tmp_path):
+    queue = SqsQueue(
+        "https://sqs.eu-west-1.amazonaws.com/123/queue",
+        claim_check_store=LocalBlobStore(str(tmp_path)),
+        claim_check_threshold=1024,
+    )
+    body = {"payload": "x" * 2048}
+    queue.send_message(SqsMessage(body=body))
+    sent, = sqs_client.calls["send_message"]
+    sqs_client.messages[queue.url].append({
+        "ReceiptHandle": "receipt-handle",
+        "Body": sent["MessageBody"],
+        "MessageAttributes": sent["MessageAttributes"],
+    })
+
+    msg = queue.receive_message(delete=True)
+    assert os.listdir(tmp_path) == []
+    assert msg.body == body
+
+
+def test_send_messages_keeps_results_of_sent_batches_when_later_batch_fails(sqs_client, monkeypatch):
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue")
+    messages = [SqsMessage(body=f"message {i}") for i in range(15)] + [SqsMessage(body="x" * 300 * 1024)]
+    send_message_batch = sqs_client.send_message_batch
+
+    def fail_second_batch(QueueUrl, Entries):
+        if sqs_client.calls["send_message_batch"]:
+            raise ConnectionError("Connection reset")
+        return send_message_batch(QueueUrl, Entries)
+
+    monkeypatch.setattr(sqs_client, "send_message_batch", fail_second_batch)
+    results = queue.send_messages(messages)
+
+    assert [r.ok for r in results] == [True] * 10 + [False] * 6
+    assert all(isinstance(r.exception, ConnectionError) for r in results[10:15])
+    assert isinstance(results[15].exception, ValueError)
+
+
+def test_forward_messages_sends_raw_body_and_hands_over_offloaded_body(sqs_client, tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path))
+    blob_store.write_text("key-1", "x" * 2048)
+    queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/queue", claim_check_store=blob_store)
+    claim_checked = SqsMessage.from_sqs_dict({
+        "MessageId": "id-1",
+        "ReceiptHandle": "rh-1",
+        "Body": "key-1",
+        "MessageAttributes": {CLAIM_CHECK_ATTRIBUTE: {"DataType": "String", "StringValue": "key-1"}},
+    }, queue=queue)
+    plain = SqsMessage.from_sqs_dict({"MessageId": "id-2", "ReceiptHandle": "rh-2", "Body": "42"}, queue=queue)
+
+    fifo_queue = SqsQueue("https://sqs.eu-west-1.amazonaws.com/123/other.fifo")
+    results = fifo_queue.forward_messages([claim_checked, plain])
+
+    assert all(r.ok for r in results)
+    first, second = sqs_client.calls["send_message_batch"][0]
+    assert first["MessageBody"] == "key-1"
+    assert first["MessageAttributes"] == {CLAIM_CHECK_ATTRIBUTE: {"DataType": "String", "StringValue": "key-1"}}
+    assert second["MessageBody"] == "42"
+    assert (second["MessageGroupId"], second["MessageDeduplicationId"]) == ("id-2", "id-2")
+
+    # The forwarded message refers to the same offloaded body, so it's kept
+    claim_checked.delete()
+    assert os.listdir(tmp_path) == ["key-1"]
@@ -0,0 +1,35 @@
+import multiprocessing
+import threading
+import time
+
+from bwrapper.supervisor import ProcessSupervisor
+
+
+def test_supervisor_notices_exits_immediately_and_enforces_timeouts():
+    supervisor = ProcessSupervisor()
+    quick = multiprocessing.Process(target=time.sleep, args=(0.1,))
+    slow = multiprocessing.Process(target=time.sleep, args=(30,))
+    quick.start()
+    slow.start()
+
+    results = {}
+
+    def wait(name, process, timeout):
+        results[name] = (supervisor.wait(process, timeout=timeout), time.time() - started)
+
+    started = time.time()
+    threads = [
+        threading.Thread(target=wait, args=("quick", quick, 300)),
+        threading.Thread(target=wait, args=("slow", slow, 0.5)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    quick_timed_out, quick_duration = results["quick"]
+    slow_timed_out, slow_duration = results["slow"]
+    assert not quick_timed_out and quick_duration < 0.4
+    assert slow_timed_out and 0.5 <= slow_duration < 2
+    slow.join()
+    assert slow.exitcode != 0